@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# benchmark.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmarks the real Client and TorrentListView against rpc_server.py.
+
+For every size a fresh process loads the torrent list into a window, then
+polls for a while, and reports:
+
+- time until the full list is loaded and how long each poll took
+- how much the main loop was blocked, measured by a 10ms heartbeat
+- resident memory per torrent for the whole app and for Torrent objects alone,
+  and how much creating their file and tracker stores lazily saves
+
+The view needs a display, use xvfb-run where there is none. Templates come
+from the compiled resources in the build directory:
+
+    meson build && ninja -C build
+    ./benchmarks/benchmark.py --builddir build --sizes 1000 10000 50000
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import gettext
+import argparse
+import tempfile
+import subprocess
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(SOURCE_DIR, 'benchmarks', 'rpc_server.py')
+
+HEARTBEAT_MS = 10
+# Heartbeats later than this count as the main loop being blocked
+BLOCKED_MS = 20
+
+
+def rss() -> int:
+    """Resident memory of this process in bytes"""
+    gc.collect()
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+class Heartbeat:
+    """Measures how long the main loop goes without running a timeout"""
+    def __init__(self, GLib):
+        self._GLib = GLib
+        self.reset()
+        GLib.timeout_add(HEARTBEAT_MS, self._beat)
+
+    def reset(self):
+        self._last = time.perf_counter()
+        self.blocked = 0.0
+        self.longest = 0.0
+
+    def _beat(self):
+        now = time.perf_counter()
+        late = now - self._last - HEARTBEAT_MS / 1000
+        self._last = now
+        if late * 1000 > BLOCKED_MS:
+            self.blocked += late
+        self.longest = max(self.longest, late)
+        return self._GLib.SOURCE_CONTINUE
+
+
+def start_server(size: int, args) -> (subprocess.Popen, int):
+    server = subprocess.Popen([sys.executable, SERVER, '--port', '0', '--torrents', str(size),
+                               '--latency', str(args.latency), '--churn', str(args.churn)],
+                              stdout=subprocess.PIPE, universal_newlines=True)
+    port = int(server.stdout.readline().split()[-1])
+    return server, port
+
+
+def setup_gi(builddir: str):
+    gettext.install('trg')
+    sys.path.insert(1, SOURCE_DIR)
+    import gi
+    gi.require_versions({
+        'Gdk': '3.0',
+        'Gtk': '3.0',
+        'Soup': '2.4',
+    })
+    from gi.repository import Gio
+    resource = Gio.Resource.load(os.path.join(builddir, 'data', 'se.tingping.Trg.gresource'))
+    resource._register()
+
+
+def run_objects(size: int, args) -> dict:
+    """
+    Memory of the Torrent objects alone, without a client or view
+
+    Measured once as created by a full refresh, with trackers, and once as
+    created by a poll, without them. Both are repeated with torrents that
+    create their file and tracker stores up front, as before they were
+    created on first use, to report what that saves per torrent.
+    """
+    setup_gi(args.builddir)
+    sys.path.insert(1, os.path.join(SOURCE_DIR, 'benchmarks'))
+    from gi.repository import Gio
+    from rpc_server import TorrentGenerator
+    from trg.torrent import Torrent, TorrentFile
+    from trg.tracker import Tracker
+
+    class EagerTorrent(Torrent):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self._files = Gio.ListStore.new(TorrentFile)
+            self._trackers = Gio.ListStore.new(Tracker)
+
+    generator = TorrentGenerator()
+    responses = [generator.torrent(i) for i in range(1, size + 1)]
+    polled = [{k: v for k, v in response.items() if k != 'trackers'} for response in responses]
+    results = {}
+    kept = []  # So later runs can't reuse memory freed by earlier ones
+    for key, cls, run_responses in (('torrent', Torrent, responses),
+                                    ('torrent_no_trackers', Torrent, polled),
+                                    ('torrent_eager', EagerTorrent, responses),
+                                    ('torrent_eager_no_trackers', EagerTorrent, polled)):
+        before = rss()
+        start = time.perf_counter()
+        torrents = [cls.new_from_response(response) for response in run_responses]
+        elapsed = time.perf_counter() - start
+        results[key + '_bytes'] = (rss() - before) / size
+        results[key + '_create_us'] = elapsed / size * 1e6
+        kept.append(torrents)
+    for suffix in ('', '_no_trackers'):
+        eager = results['torrent_eager{}_bytes'.format(suffix)]
+        results['lazy_saved{}_bytes'.format(suffix)] = eager - results['torrent{}_bytes'.format(suffix)]
+    return results
+
+
+def run_app(size: int, args) -> dict:
+    """Loads the list into a window with the real client then polls for a while"""
+    setup_gi(args.builddir)
+    from gi.repository import GLib, Gtk
+    from trg.client import Client
+    from trg.torrent_list_view import TorrentListView
+
+    class BenchmarkClient(Client):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.poll_times = []
+            self._poll_started = {}
+
+        def _refresh(self):
+            if self._poll_message is None:
+                self._poll_started[self._poll_serial + 1] = time.perf_counter()
+            super()._refresh()
+
+        def _on_refresh_complete(self, serial, response):
+            super()._on_refresh_complete(serial, response)
+            started = self._poll_started.pop(serial, None)
+            if started is not None:
+                self.poll_times.append(time.perf_counter() - started)
+
+    server, port = start_server(size, args)
+    loop = GLib.MainLoop()
+    results = {}
+    try:
+        heartbeat = Heartbeat(GLib)
+        before = rss()
+        start = time.perf_counter()
+        client = BenchmarkClient(hostname='localhost', port=port, timeout=args.interval)
+
+        window = Gtk.Window(default_width=1000, default_height=700)
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.add(TorrentListView(client.props.torrents, client=client))
+        window.add(scrolled)
+        window.show_all()
+
+        def on_connected(client, pspec):
+            if not client.props.connected or 'load_s' in results:
+                return
+            results['load_s'] = time.perf_counter() - start
+            results['load_blocked_s'] = heartbeat.blocked
+            results['load_longest_block_s'] = heartbeat.longest
+            results['rss_per_torrent'] = (rss() - before) / size
+            heartbeat.reset()
+            GLib.timeout_add_seconds(args.poll_time, loop.quit)
+
+        client.connect('notify::connected', on_connected)
+        GLib.timeout_add_seconds(args.max_time, loop.quit)
+        loop.run()
+
+        if client.poll_times:
+            poll_times = sorted(client.poll_times)
+            results['polls'] = len(poll_times)
+            results['poll_median_s'] = poll_times[len(poll_times) // 2]
+            results['poll_max_s'] = poll_times[-1]
+        results['poll_blocked_s'] = heartbeat.blocked
+        results['poll_longest_block_s'] = heartbeat.longest
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+def run_child(size: int, args) -> int:
+    results = {'size': size}
+    if args.child == 'objects':
+        results.update(run_objects(size, args))
+    else:
+        results.update(run_app(size, args))
+    print(json.dumps(results), flush=True)
+    return 0
+
+
+def format_row(results: dict) -> str:
+    def ms(key):
+        value = results.get(key)
+        return '{:9.1f}'.format(value * 1000) if value is not None else '        -'
+
+    def num(key, fmt='{:9.0f}'):
+        value = results.get(key)
+        return fmt.format(value) if value is not None else '        -'
+
+    return '{:>7} {} {} {} {} {} {} {} {} {} {} {}'.format(
+        results['size'], ms('load_s'), ms('load_longest_block_s'), ms('poll_median_s'), ms('poll_max_s'),
+        ms('poll_blocked_s'), num('rss_per_torrent'), num('torrent_bytes'), num('torrent_no_trackers_bytes'),
+        num('lazy_saved_bytes'), num('lazy_saved_no_trackers_bytes'), num('torrent_create_us', '{:9.1f}'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the client against a fake server')
+    parser.add_argument('--builddir', default=os.environ.get('MESON_BUILD_ROOT', os.path.join(SOURCE_DIR, 'build')))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--latency', type=float, default=20, help='milliseconds of server latency')
+    parser.add_argument('--churn', type=float, default=0.01, help='fraction of torrents changing per second')
+    parser.add_argument('--interval', type=int, default=1, help='seconds between polls')
+    parser.add_argument('--poll-time', type=int, default=15, help='seconds to poll after loading')
+    parser.add_argument('--max-time', type=int, default=300, help='seconds before giving up on a size')
+    parser.add_argument('--json', action='store_true', help='print results as JSON lines')
+    parser.add_argument('--child', choices=('app', 'objects'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.sizes[0], args)
+
+    # Keep snapshots and settings of the benchmark away from the real ones
+    env = dict(os.environ, XDG_CACHE_HOME=tempfile.mkdtemp(prefix='trg-benchmark-'))
+    if not args.json:
+        print('   size   load ms  block ms   poll ms  poll max  poll blk  rss B/t  torrent B  no trk B'
+              '   saved B  saved nt  create us')
+    for size in args.sizes:
+        results = {'size': size}
+        for child in ('objects', 'app'):
+            command = [sys.executable, __file__, '--child', child, '--sizes', str(size),
+                       '--builddir', args.builddir, '--latency', str(args.latency), '--churn', str(args.churn),
+                       '--interval', str(args.interval), '--poll-time', str(args.poll_time),
+                       '--max-time', str(args.max_time)]
+            output = subprocess.check_output(command, env=env, universal_newlines=True)
+            results.update(json.loads(output.strip().splitlines()[-1]))
+        print(json.dumps(results) if args.json else format_row(results), flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# bencode_benchmark.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares the recursive bencode Decoder with decode() on synthetic .torrent files.
+
+Reports the best time of several runs and the peak memory allocated while
+decoding, for each number of files. Needs nothing but the source tree:
+
+    ./benchmarks/bencode_benchmark.py --files 100 5000 50000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, SOURCE_DIR)
+
+from trg import bencode  # noqa: E402
+
+PIECE_HASH_SIZE = 20
+
+
+def encode(value) -> bytes:
+    if isinstance(value, int):
+        return b'i%de' % value
+    if isinstance(value, bytes):
+        return b'%d:%s' % (len(value), value)
+    if isinstance(value, list):
+        return b'l' + b''.join(encode(item) for item in value) + b'e'
+    return b'd' + b''.join(encode(key) + encode(value[key]) for key in sorted(value)) + b'e'
+
+
+def make_torrent(n_files: int, piece_length: int, seed=0) -> bytes:
+    rand = random.Random(seed)
+    files = []
+    total = 0
+    for i in range(n_files):
+        length = rand.randint(1 << 10, 1 << 24)
+        total += length
+        path = [b'disc-%d' % (i % 10), b'track-%05d.flac' % i]
+        files.append({b'length': length, b'path': path})
+
+    n_pieces = (total + piece_length - 1) // piece_length
+    return encode({
+        b'announce': b'udp://tracker.example.org:6969/announce',
+        b'creation date': 1480000000,
+        b'info': {
+            b'name': b'benchmark',
+            b'piece length': piece_length,
+            b'pieces': rand.getrandbits(8 * PIECE_HASH_SIZE * n_pieces).to_bytes(PIECE_HASH_SIZE * n_pieces, 'big'),
+            b'files': files,
+        },
+    })
+
+
+def measure(decode, data: bytes, repeat: int) -> (float, int):
+    """Returns the best time in seconds and the peak allocation in bytes"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(data)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = decode(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the bencode decoders')
+    parser.add_argument('--files', type=int, nargs='+', default=[100, 5000, 50000])
+    parser.add_argument('--piece-length', type=int, default=256 * 1024, help='bytes per piece')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per decoder, the best one counts')
+    parser.add_argument('--json', action='store_true', help='print results as JSON lines')
+    args = parser.parse_args()
+
+    decoders = (
+        ('recursive', lambda data: bencode.Decoder(data).decode()),
+        ('iterative', bencode.decode),
+        ('skip pieces', lambda data: bencode.decode(data, skip_keys={b'pieces'})),
+    )
+
+    if not args.json:
+        print('  files    size MB  decoder         time ms  peak MB')
+    for n_files in args.files:
+        data = make_torrent(n_files, args.piece_length)
+        for name, decode in decoders:
+            elapsed, peak = measure(decode, data, args.repeat)
+            if args.json:
+                print(json.dumps({'files': n_files, 'bytes': len(data), 'decoder': name,
+                                  'time_s': elapsed, 'peak_bytes': peak}), flush=True)
+            else:
+                print('{:7} {:10.1f}  {:12} {:10.1f} {:8.1f}'.format(
+                    n_files, len(data) / 1e6, name, elapsed * 1000, peak / 1e6), flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# rpc_server.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Stand-in for the RPC interface of a Transmission daemon.
+
+Serves /transmission/rpc with a list of synthetic torrents that keep
+changing, enough of the protocol for the client to run against it:
+session ids with 409 Conflict, basic auth, recently-active with removed,
+the table format and gzip.
+
+    ./benchmarks/rpc_server.py --torrents 10000 --latency 50 --churn 0.01
+
+Only the standard library is used so it runs without the app's dependencies.
+"""
+
+import sys
+import gzip
+import json
+import time
+import uuid
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+RPC_VERSION = 17
+
+# How long torrents count as recently active, same as the daemon
+RECENT_SECONDS = 60
+
+_STATUS_STOPPED = 0
+_STATUS_DOWNLOAD = 4
+_STATUS_SEED = 6
+
+_TRACKERS = ['udp://tracker.example.org:6969/announce', 'http://tracker.example.com/announce',
+             'https://torrents.example.net/announce.php', 'udp://open.example.io:1337/announce']
+_DIRECTORIES = ['/srv/downloads', '/srv/downloads/linux', '/srv/media/tv', '/srv/media/movies']
+_WORDS = ['debian', 'fedora', 'ubuntu', 'arch', 'gnome', 'kde', 'live', 'server',
+          'workstation', 'netinst', 'dvd', 'amd64', 'i386', 'arm64', 'iso', 'image']
+
+
+class TorrentGenerator:
+    """Creates synthetic torrents that look like what the daemon returns"""
+    def __init__(self, seed=0):
+        self._random = random.Random(seed)
+
+    def torrent(self, torrent_id: int) -> dict:
+        rand = self._random
+        total_size = rand.randint(1 << 20, 1 << 34)
+        percent_done = rand.choice((0.0, 1.0, 1.0, rand.random()))
+        status = rand.choice((_STATUS_STOPPED, _STATUS_DOWNLOAD, _STATUS_SEED))
+        name = '-'.join(rand.sample(_WORDS, 4)) + '-{}'.format(torrent_id)
+        trackers = rand.sample(_TRACKERS, rand.randint(1, 2))
+        return {
+            'id': torrent_id,
+            'name': name,
+            'hashString': hashlib.sha1(name.encode('UTF-8')).hexdigest(),
+            'totalSize': total_size,
+            'sizeWhenDone': total_size,
+            'percentDone': percent_done,
+            'status': status if percent_done < 1.0 else rand.choice((_STATUS_STOPPED, _STATUS_SEED)),
+            'isFinished': percent_done == 1.0 and rand.random() < 0.2,
+            'rateDownload': 0,
+            'rateUpload': 0,
+            'eta': -1,
+            'error': rand.choice((0,) * 19 + (2,)),
+            'downloadDir': rand.choice(_DIRECTORIES),
+            'trackers': [{'announce': url, 'scrape': '', 'id': i, 'tier': i} for i, url in enumerate(trackers)],
+            'fileCount': rand.randint(1, 20),
+        }
+
+    def files(self, torrent: dict) -> tuple:
+        """Returns files and fileStats for a torrent"""
+        count = torrent['fileCount']
+        length = torrent['totalSize'] // count
+        done = int(length * torrent['percentDone'])
+        files = [{'name': '{}/file-{}.dat'.format(torrent['name'], i), 'length': length, 'bytesCompleted': done}
+                 for i in range(count)]
+        stats = [{'wanted': True, 'priority': 0, 'bytesCompleted': done} for _i in range(count)]
+        return files, stats
+
+    def churn(self, torrent: dict):
+        """Changes a torrent as if it was transferring"""
+        rand = self._random
+        if torrent['percentDone'] < 1.0:
+            torrent['status'] = _STATUS_DOWNLOAD
+            torrent['rateDownload'] = rand.randint(0, 10 << 20)
+            torrent['percentDone'] = min(1.0, torrent['percentDone'] + rand.random() * 0.05)
+            torrent['eta'] = rand.randint(1, 86400) if torrent['percentDone'] < 1.0 else -1
+        else:
+            torrent['status'] = _STATUS_SEED
+        torrent['rateUpload'] = rand.randint(0, 2 << 20)
+
+
+class TorrentStore:
+    """The torrents of the fake daemon, changing over time"""
+    def __init__(self, count: int, churn: float, replace: float, seed=0):
+        """
+        :param churn: Fraction of torrents that change every second
+        :param replace: Fraction of torrents removed and added again every second
+        """
+        self.lock = threading.Lock()
+        self._generator = TorrentGenerator(seed)
+        self._random = random.Random(seed)
+        self._churn = churn
+        self._replace = replace
+        self._next_id = 1
+        self.torrents = {}  # id -> torrent
+        self._active = {}  # id -> last time it changed
+        self._removed = {}  # id -> time it was removed
+        self._last_tick = time.monotonic()
+        self._carry = 0.0
+        for _i in range(count):
+            self.add()
+        # Only changes made while running count as activity
+        self._active.clear()
+
+    def add(self, name=None) -> dict:
+        torrent = self._generator.torrent(self._next_id)
+        if name:
+            torrent['name'] = name
+        self.torrents[torrent['id']] = torrent
+        self._active[torrent['id']] = time.monotonic()
+        self._next_id += 1
+        return torrent
+
+    def remove(self, torrent_id: int):
+        if self.torrents.pop(torrent_id, None) is not None:
+            self._active.pop(torrent_id, None)
+            self._removed[torrent_id] = time.monotonic()
+
+    def touch(self, torrent_id: int):
+        if torrent_id in self.torrents:
+            self._active[torrent_id] = time.monotonic()
+
+    def tick(self):
+        """Applies the churn since the last call"""
+        now = time.monotonic()
+        elapsed = now - self._last_tick
+        self._last_tick = now
+
+        cutoff = now - RECENT_SECONDS
+        for table in (self._active, self._removed):
+            for torrent_id in [i for i, when in table.items() if when < cutoff]:
+                del table[torrent_id]
+
+        if not self.torrents:
+            return
+
+        # Fractional changes carry over so slow churn still happens
+        self._carry += elapsed * len(self.torrents) * (self._churn + self._replace)
+        changes = int(self._carry)
+        self._carry -= changes
+        if not changes:
+            return
+
+        ids = self._random.sample(list(self.torrents), min(changes, len(self.torrents)))
+        replace_share = self._replace / (self._churn + self._replace)
+        for torrent_id in ids:
+            if self._random.random() < replace_share:
+                self.remove(torrent_id)
+                self.add()
+            else:
+                self._generator.churn(self.torrents[torrent_id])
+                self._active[torrent_id] = now
+
+    def recently_active(self) -> tuple:
+        return [self.torrents[i] for i in self._active if i in self.torrents], list(self._removed)
+
+    def select(self, ids) -> list:
+        if ids is None:
+            return list(self.torrents.values())
+        if not isinstance(ids, list):
+            ids = [ids]
+        return [self.torrents[i] for i in ids if i in self.torrents]
+
+    def files(self, torrent: dict) -> tuple:
+        return self._generator.files(torrent)
+
+
+class RPCServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, store: TorrentStore, latency=0.0, username='', password='',
+                 compress=True, rotate=0.0):
+        """
+        :param latency: Seconds added to every response
+        :param rotate: Seconds after which the session id changes, 0 for never
+        """
+        super().__init__(address, RPCHandler)
+        self.store = store
+        self.latency = latency
+        self.credentials = None
+        if username or password:
+            self.credentials = base64.b64encode('{}:{}'.format(username, password).encode('UTF-8')).decode()
+        self.compress = compress
+        self.rotate = rotate
+        self._session_id = None
+        self._session_time = 0
+
+    @property
+    def session_id(self) -> str:
+        now = time.monotonic()
+        if self._session_id is None or (self.rotate and now - self._session_time > self.rotate):
+            self._session_id = uuid.uuid4().hex
+            self._session_time = now
+        return self._session_id
+
+
+class RPCHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes=b'', headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        data = self.rfile.read(length)
+
+        if self.path != '/transmission/rpc':
+            self._send(404)
+            return
+
+        server = self.server
+        if server.credentials:
+            auth = self.headers.get('Authorization', '')
+            if auth != 'Basic ' + server.credentials:
+                self._send(401, b'Unauthorized', {'WWW-Authenticate': 'Basic realm="Transmission"'})
+                return
+
+        session_id = server.session_id
+        if self.headers.get('X-Transmission-Session-Id') != session_id:
+            self._send(409, b'Conflict', {'X-Transmission-Session-Id': session_id})
+            return
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        try:
+            request = json.loads(data.decode('UTF-8'))
+        except ValueError:
+            self._send(400)
+            return
+
+        with server.store.lock:
+            server.store.tick()
+            response = handle_request(server.store, request)
+        body = json.dumps(response, separators=(',', ':')).encode('UTF-8')
+
+        headers = {'Content-Type': 'application/json', 'X-Transmission-Session-Id': session_id}
+        if server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
+        self._send(200, body, headers)
+
+
+def _torrent_get(store: TorrentStore, arguments: dict) -> dict:
+    ids = arguments.get('ids')
+    removed = None
+    if ids == 'recently-active':
+        torrents, removed = store.recently_active()
+    else:
+        torrents = store.select(ids)
+
+    fields = arguments.get('fields', [])
+    table = arguments.get('format') == 'table'
+    rows = []
+    for torrent in torrents:
+        if 'files' in fields or 'fileStats' in fields:
+            files, stats = store.files(torrent)
+            torrent = dict(torrent, files=files, fileStats=stats)
+        # Building objects directly keeps the server's share of a large load small
+        if table:
+            rows.append([torrent.get(field) for field in fields])
+        else:
+            rows.append({field: torrent.get(field) for field in fields})
+
+    if table:
+        result = {'torrents': [fields] + rows if rows else []}
+    else:
+        result = {'torrents': rows}
+    if removed is not None:
+        result['removed'] = removed
+    return result
+
+
+def handle_request(store: TorrentStore, request: dict) -> dict:
+    method = request.get('method')
+    arguments = request.get('arguments', {})
+    ids = arguments.get('ids')
+    result = {}
+
+    if method == 'session-get':
+        result = {
+            'rpc-version': RPC_VERSION,
+            'version': '4.0.0 (stand-in)',
+            'download-dir': _DIRECTORIES[0],
+            'download-dir-free-space': 1 << 40,
+            'alt-speed-enabled': False,
+        }
+        if 'fields' in arguments:
+            result = {key: value for key, value in result.items() if key in arguments['fields']}
+    elif method == 'session-stats':
+        torrents = store.torrents.values()
+        result = {
+            'downloadSpeed': sum(t['rateDownload'] for t in torrents),
+            'uploadSpeed': sum(t['rateUpload'] for t in torrents),
+            'torrentCount': len(store.torrents),
+        }
+    elif method == 'torrent-get':
+        result = _torrent_get(store, arguments)
+    elif method == 'torrent-add':
+        torrent = store.add(arguments.get('filename'))
+        result = {'torrent-added': {key: torrent[key] for key in ('id', 'name', 'hashString')}}
+    elif method == 'torrent-remove':
+        for torrent in store.select(ids):
+            store.remove(torrent['id'])
+    elif method in ('torrent-start', 'torrent-stop', 'torrent-verify', 'torrent-reannounce',
+                    'torrent-set', 'torrent-set-location', 'torrent-rename-path'):
+        status = {'torrent-start': _STATUS_DOWNLOAD, 'torrent-stop': _STATUS_STOPPED}.get(method)
+        for torrent in store.select(ids):
+            if status is not None:
+                torrent['status'] = status
+            if method == 'torrent-set-location':
+                torrent['downloadDir'] = arguments.get('location', torrent['downloadDir'])
+            store.touch(torrent['id'])
+    elif method in ('session-set', 'free-space', 'port-test'):
+        pass
+    else:
+        return {'result': 'method name not recognized', 'arguments': {}}
+
+    response = {'result': 'success', 'arguments': result}
+    if 'tag' in request:
+        response['tag'] = request['tag']
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Transmission RPC server')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=9091, help='0 picks a free port')
+    parser.add_argument('--torrents', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0, help='milliseconds added to every response')
+    parser.add_argument('--churn', type=float, default=0.01, help='fraction of torrents changing per second')
+    parser.add_argument('--replace', type=float, default=0.0005,
+                        help='fraction of torrents removed and added per second')
+    parser.add_argument('--rotate-session', type=float, default=0, help='seconds between session id changes')
+    parser.add_argument('--username', default='')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--no-gzip', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    store = TorrentStore(args.torrents, args.churn, args.replace, args.seed)
+    server = RPCServer((args.host, args.port), store, latency=args.latency / 1000,
+                       username=args.username, password=args.password,
+                       compress=not args.no_gzip, rotate=args.rotate_session)
+    # The benchmark reads this line to find the port
+    print('Listening on {}'.format(server.server_address[1]), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
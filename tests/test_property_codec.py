@@ -0,0 +1,76 @@
+# test_property_codec.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import gettext
+import tempfile
+import unittest
+
+# Keep the client from reading or writing real snapshots
+os.environ['XDG_CACHE_HOME'] = tempfile.mkdtemp(prefix='trg-test-')
+gettext.install('trg')
+
+import gi
+gi.require_versions({
+    'Gtk': '3.0',
+    'Soup': '2.4',
+})
+
+from trg.client import Client
+from trg.torrent import Torrent
+
+
+class Notifications:
+    def __init__(self, obj):
+        self.names = []
+        obj.connect('notify', lambda obj, pspec: self.names.append(pspec.name))
+
+
+class TestPropertyCodec(unittest.TestCase):
+    def test_torrent_update(self):
+        torrent = Torrent.new_from_response({'id': 1, 'name': 'a', 'downloadDir': '/old', 'percentDone': 0.5})
+        notifications = Notifications(torrent)
+
+        torrent.update_from_response({'downloadDir': '/new', 'percentDone': 0.5, 'unknownField': 1})
+        self.assertEqual(torrent.download_dir, '/new')
+        self.assertEqual(torrent.props.download_dir, '/new')
+        self.assertEqual(notifications.names, ['download-dir'])
+
+        torrent.update_from_response({'downloadDir': '/new'})
+        self.assertEqual(notifications.names, ['download-dir'])
+
+    def test_torrent_trackers(self):
+        torrent = Torrent.new_from_response({'id': 1, 'name': 'a'})
+        notifications = Notifications(torrent)
+
+        torrent.update_from_response({'trackers': [{'announce': 'udp://tracker.example.org:80', 'id': 0}]})
+        self.assertEqual(torrent.tracker_hosts, {'tracker.example.org'})
+        self.assertEqual(torrent.trackers.get_n_items(), 1)
+        self.assertEqual(notifications.names, ['trackers'])
+
+    def test_client_update(self):
+        client = Client(hostname='localhost', port=1)
+        notifications = Notifications(client)
+
+        Client._codec.update(client, {'download-dir': '/downloads', 'alt-speed-enabled': True})
+        self.assertEqual(client.props.download_dir, '/downloads')
+        self.assertTrue(client.props.alt_speed_enabled)
+        self.assertCountEqual(notifications.names, ['download-dir', 'alt-speed-enabled'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,10 +25,9 @@ from gi.repository import (
 
 from .gi_composites import GtkTemplate
 from .client import Client
-from .torrent import Torrent
 from .torrent_file import TorrentFile
 from .torrent_file_view import TorrentFileView, FileColumn
-from .list_model_override import ListStore
+from .utils import normalize_directory
 
 
 @GtkTemplate(ui='/se/tingping/Trg/ui/adddialog.ui')
@@ -60,9 +59,7 @@ class AddDialog(Gtk.Dialog):
 
         self.destination_combo.append_text(self.client.props.download_dir)
         self.destination_combo.set_active(0)
-        torrent_directories = {torrent.props.download_dir.rstrip('/')
-                               for torrent in ListStore(self.client.props.torrents)}
-        for directory in sorted(torrent_directories):
+        for directory in self.client.torrent_facets.directories.values():
             self.destination_combo.append_text(directory)
 
         self.connect('notify::uri', self._on_uri_change)
@@ -210,7 +207,7 @@ class AddURIDialog(Gtk.Dialog):
 class MoveDialog(Gtk.Dialog):
     __gtype_name__ = 'MoveDialog'
 
-    torrent = GObject.Property(type=Torrent)
+    torrents = GObject.Property(type=object)  # List of Torrent
     client = GObject.Property(type=Client)
     destination_combo = GtkTemplate.Child()
 
@@ -219,13 +216,16 @@ class MoveDialog(Gtk.Dialog):
         self.init_template()
 
         self.set_response_sensitive(Gtk.ResponseType.OK, False)
+        if len(self.torrents) > 1:
+            self.props.title = _('Move {} Torrents').format(len(self.torrents))
+
+        # Only preselect a directory if all of the torrents share it
+        current_directories = {normalize_directory(torrent.download_dir) for torrent in self.torrents}
 
         self.destination_combo.append_text(self.client.props.download_dir)
-        torrent_directories = {torrent.props.download_dir.rstrip('/')
-                               for torrent in ListStore(self.client.props.torrents)}
-        for i, directory in enumerate(sorted(torrent_directories)):
+        for i, directory in enumerate(self.client.torrent_facets.directories.values()):
             self.destination_combo.append_text(directory)
-            if directory == self.torrent.download_dir:
+            if {directory} == current_directories:
                 self.destination_combo.set_active(i + 1)
 
     @GtkTemplate.Callback
@@ -236,7 +236,7 @@ class MoveDialog(Gtk.Dialog):
     def do_response(self, response_id):
         if response_id == Gtk.ResponseType.OK:
             path = self.destination_combo.get_active_text()
-            self.client.torrent_set_location(self.torrent, path)
+            self.client.torrent_set_location(self.torrents, path)
 
         if response_id != Gtk.ResponseType.DELETE_EVENT:
             self.destroy()
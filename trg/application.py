@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
 import logging
 
 import gi
@@ -26,9 +27,8 @@ from gi.repository import (
     Gtk
 )
 
-from .window import ApplicationWindow
-from .preferences_dialog import PreferencesDialog
 from .client import Client
+from . import rpc_trace, startup_profile
 
 try:
     gi.require_version('StatusNotifier', '1.0')
@@ -56,7 +56,11 @@ class Application(Gtk.Application):
         self.settings = Gio.Settings.new('se.tingping.Trg')
 
         self.add_main_option('log', 0, GLib.OptionFlags.NONE, GLib.OptionArg.INT,
-                             _('Set log level'), None)
+                             _('Set log level, 4 also writes full RPC traces to a file'), None)
+        self.add_main_option('rpc-trace-limit', 0, GLib.OptionFlags.NONE, GLib.OptionArg.INT,
+                             _('Maximum bytes of each RPC payload to log, 0 for no limit'), None)
+        self.add_main_option('profile-startup', 0, GLib.OptionFlags.NONE, GLib.OptionArg.NONE,
+                             _('Print how long each part of startup took'), None)
 
     def do_startup(self):
         Gtk.Application.do_startup(self)
@@ -117,6 +121,7 @@ class Application(Gtk.Application):
     def _init_service(self):
         if self.props.flags & Gio.ApplicationFlags.IS_SERVICE:
             self.hold()
+            startup_profile.report_after('first RPC response')
 
         # FIXME: File system encoding
         def file_changed(monitor, file_changed, other_file, event):
@@ -144,9 +149,13 @@ class Application(Gtk.Application):
 
         self.client = Client(username=self.settings['username'], password=self.settings['password'],
                              hostname=self.settings['hostname'], port=self.settings['port'],
-                             tls=self.settings['tls'])
+                             tls=self.settings['tls'], max_connections=self.settings['max-connections'],
+                             idle_timeout=self.settings['idle-timeout'], keep_alive=self.settings['keep-alive'],
+                             request_timeout=self.settings['request-timeout'],
+                             max_retries=self.settings['max-retries'])
 
-        for prop in ('username', 'password', 'hostname', 'port', 'tls'):
+        for prop in ('username', 'password', 'hostname', 'port', 'tls',
+                     'max-connections', 'idle-timeout', 'keep-alive', 'request-timeout', 'max-retries'):
             self.settings.bind(prop, self.client, prop, Gio.SettingsBindFlags.GET)
 
     def do_open(self, files, n_files, hint):
@@ -160,6 +169,7 @@ class Application(Gtk.Application):
     def do_handle_local_options(self, options):
         if options.contains('log'):
             level = options.lookup_value('log', GLib.VariantType('i')).get_int32()
+            trace_to_file = level >= 4
             if level >= 3:
                 level = logging.DEBUG
             elif level == 2:
@@ -172,8 +182,19 @@ class Application(Gtk.Application):
             # TODO: Improve logging format
             logging.basicConfig(level=level,
                                 format=' %(levelname)s | %(module)s.%(funcName)s:%(lineno)d\t| %(message)s')
+            if trace_to_file:
+                rpc_trace.enable_file_sink(os.path.join(GLib.get_user_cache_dir(), 'trg', 'rpc-trace.log'))
             options.remove('log')
 
+        if options.contains('rpc-trace-limit'):
+            limit = options.lookup_value('rpc-trace-limit', GLib.VariantType('i')).get_int32()
+            rpc_trace.set_limit(limit)
+            options.remove('rpc-trace-limit')
+
+        if options.contains('profile-startup'):
+            # Already enabled by the launcher, it has to be before any imports
+            options.remove('profile-startup')
+
         return Gtk.Application.do_handle_local_options(self, options)
 
     def do_activate(self):
@@ -182,16 +203,24 @@ class Application(Gtk.Application):
             self.client.props.timeout = 30 # We can relax the timer if there is no UI
 
         if not self.window:
+            from .window import ApplicationWindow
+            startup_profile.mark('window imported')
             self.window = ApplicationWindow(application=self, client=self.client)
             self.window.connect('destroy', on_window_destroy)
             self.client.props.timeout = 10
+            if startup_profile.is_enabled():
+                self.window.connect('map', lambda window: startup_profile.mark('window mapped'))
+                startup_profile.report_after('window mapped', 'first RPC response')
 
         self.window.present()
 
     def do_shutdown(self):
+        if self.client:
+            self.client.save_snapshot()
         Gtk.Application.do_shutdown(self)
 
     def on_preferences(self, action, param):
+        from .preferences_dialog import PreferencesDialog
         dialog = PreferencesDialog(transient_for=self.window, modal=True, client=self.client)
         dialog.present()
 
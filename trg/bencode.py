@@ -8,6 +8,10 @@ __license__ = "GPL v2"
 
 
 class Decoder:
+    """
+    The original recursive decoder, decode() replaces it and this is kept
+    to compare against in benchmarks/bencode_benchmark.py
+    """
     def __init__(self, data: bytes):
         self.data = data
         self.idx = 0
@@ -98,7 +102,114 @@ class DecodingError(Exception):
         return repr(self.msg)
 
 
-def decode(data: bytes):
-    """Convenience function. Initializes Decoder class, calls decode method, and returns the result."""
-    decoder = Decoder(data)
-    return decoder.decode()
+# Byte strings at least this long are returned as memoryviews of the data instead of copies
+VIEW_THRESHOLD = 1024
+
+_DICT = ord('d')
+_LIST = ord('l')
+_INT = ord('i')
+_END = ord('e')
+_DIGITS = frozenset(b'0123456789')
+
+_NO_KEY = object()  # A dictionary waiting for its next key
+_SKIPPED = object()  # Key of a value that is left out
+
+
+def decode(data: bytes, skip_keys=frozenset()):
+    """
+    Decodes data without recursion, see Decoder.decode() for the returned structure.
+
+    Byte strings of VIEW_THRESHOLD bytes or more are memoryviews into data,
+    which keep all of it alive. Values of dictionary keys in skip_keys are
+    still checked for errors but are not copied or returned.
+    """
+    if not isinstance(data, bytes):
+        data = bytes(data)
+    view = memoryview(data)
+    find = data.find
+    length = len(data)
+    wrap = data[0:1] not in (b'd', b'l')
+    values = []  # Top level values
+    # The innermost open container and for a dict the key waiting for its value, None for a list.
+    # The outer ones are on the stacks.
+    container = None
+    key = None
+    containers = []
+    keys = []
+
+    pos = 0
+    while pos < length:
+        char = data[pos]
+        if char in _DIGITS:
+            colon = find(b':', pos)
+            if colon < 0:
+                raise DecodingError('Unable to locate terminator character ":" after index {}.'.format(pos))
+            try:
+                size = int(data[pos:colon])
+            except ValueError:
+                raise DecodingError('Invalid string length at index {}.'.format(pos))
+            pos = colon + 1 + size
+            if pos > length:
+                raise DecodingError('String at index {} runs past the end of the data.'.format(colon + 1))
+            if key is _SKIPPED:
+                value = None
+            elif size >= VIEW_THRESHOLD:
+                value = view[colon + 1:pos]
+            else:
+                value = data[colon + 1:pos]
+        elif char == _INT:
+            end = find(b'e', pos)
+            if end < 0:
+                raise DecodingError('Unable to locate terminator character "e" after index {}.'.format(pos))
+            try:
+                value = int(data[pos + 1:end])
+            except ValueError:
+                raise DecodingError('Invalid integer at index {}.'.format(pos))
+            pos = end + 1
+        elif char == _DICT:
+            containers.append(container)
+            keys.append(key)
+            container = {}
+            key = _NO_KEY
+            pos += 1
+            continue
+        elif char == _LIST:
+            containers.append(container)
+            keys.append(key)
+            container = []
+            key = None
+            pos += 1
+            continue
+        elif char == _END and container is not None:
+            if key is not _NO_KEY and key is not None:
+                raise DecodingError('Dictionary key without a value before index {}.'.format(pos))
+            value = container
+            container = containers.pop()
+            key = keys.pop()
+            pos += 1
+        else:
+            raise DecodingError('Invalid token character ({}) at position {}.'.format(chr(char), pos))
+
+        if key is None:
+            if container is None:
+                values.append(value)
+                if not wrap:
+                    break
+            else:
+                container.append(value)
+        elif key is _NO_KEY:
+            if type(value) is memoryview:
+                value = value.tobytes()
+            elif not isinstance(value, bytes):
+                raise DecodingError('Dictionary key before index {} is not a string.'.format(pos))
+            key = _SKIPPED if value in skip_keys else value
+        else:
+            if key is not _SKIPPED:
+                container[key] = value
+            key = _NO_KEY
+
+    if container is not None:
+        raise DecodingError('Unexpected End of File at index position of {}.'.format(length))
+    if wrap:
+        return tuple(values)
+    return values[0]
@@ -16,8 +16,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import json
-import pprint
 import logging
+from functools import partial
 from gettext import gettext as _
 
 from gi.repository import (
@@ -27,13 +27,35 @@ from gi.repository import (
     Soup,
 )
 
+from . import rpc_trace, snapshot, startup_profile
+from .json_stream import TorrentStreamDecoder, TableDecoder
+from .request_coalescer import RequestCoalescer
+from .request_policy import RequestPolicy, CircuitBreaker, CircuitState, is_transient
 from .utils import is_flatpak
+from .list_model_override import ListStore
 from .torrent import Torrent, TorrentStatus
+from .property_codec import PropertyCodec
+from .torrent_index import TorrentIndex
+from .torrent_facets import TorrentFacets
 from .timer import Timer
 
 _REFRESH_ALL_LIST = ['id', 'name', 'rateDownload', 'rateUpload', 'eta',
                      'sizeWhenDone', 'percentDone', 'totalSize', 'status',
-                     'isFinished', 'trackers', 'downloadDir', 'error']
+                     'isFinished', 'trackers', 'downloadDir', 'error', 'hashString']
+
+_REFRESH_LIST = ['id', 'name', 'rateDownload', 'rateUpload', 'eta',
+                 'sizeWhenDone', 'percentDone', 'totalSize', 'status',
+                 'isFinished', 'error']
+
+# First version to support the table format of torrent-get
+_TABLE_FORMAT_RPC_VERSION = 16
+
+# Soup.Session's own limit on connections to all hosts
+_MAX_CONNECTIONS = 10
+
+# New torrents of a full refresh are added in batches at least this big so that
+# views take their bulk rebuild path (ListTreeModel.BULK_THRESHOLD)
+_ADD_BATCH_SIZE = 200
 
 
 class Client(GObject.Object):
@@ -83,6 +105,44 @@ class Client(GObject.Object):
             False,
             GObject.ParamFlags.CONSTRUCT|GObject.ParamFlags.READWRITE,
         ),
+        # These tune the HTTP connections
+        'max-connections': (
+            GObject.TYPE_UINT, _('Maximum Connections'), _('Maximum number of connections to the server'),
+            1, _MAX_CONNECTIONS, 2,
+            GObject.ParamFlags.CONSTRUCT|GObject.ParamFlags.READWRITE,
+        ),
+        'idle-timeout': (
+            GObject.TYPE_UINT, _('Idle Timeout'), _('Seconds before an idle connection is closed, 0 for never'),
+            0, GLib.MAXUINT, 60,
+            GObject.ParamFlags.CONSTRUCT|GObject.ParamFlags.READWRITE,
+        ),
+        'keep-alive': (
+            bool, _('Keep Alive'), _('Reuse connections between requests'),
+            True,
+            GObject.ParamFlags.CONSTRUCT|GObject.ParamFlags.READWRITE,
+        ),
+        'request-timeout': (
+            GObject.TYPE_UINT, _('Request Timeout'), _('Seconds a request may go without receiving anything'),
+            1, GLib.MAXUINT, 30,
+            GObject.ParamFlags.CONSTRUCT|GObject.ParamFlags.READWRITE,
+        ),
+        'max-retries': (
+            GObject.TYPE_UINT, _('Maximum Retries'), _('Times a request that failed temporarily is sent again'),
+            0, 10, 3,
+            GObject.ParamFlags.CONSTRUCT|GObject.ParamFlags.READWRITE,
+        ),
+        'stale': (
+            bool, _('Stale'), _('Torrents are from a snapshot and not yet updated by the server'),
+            False, GObject.ParamFlags.READABLE
+        ),
+        'bytes-received': (
+            GObject.TYPE_UINT64, _('Bytes Received'), _('Decoded size of all responses'),
+            0, GLib.MAXUINT64, 0, GObject.ParamFlags.READABLE
+        ),
+        'bytes-transferred': (
+            GObject.TYPE_UINT64, _('Bytes Transferred'), _('Size on the wire of all responses with a known length'),
+            0, GLib.MAXUINT64, 0, GObject.ParamFlags.READABLE
+        ),
         # These are session properties
         'download-dir': (
             str, _('Download Directory'), _('Directory downloads are saved to'),
@@ -110,13 +170,41 @@ class Client(GObject.Object):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.torrents = Gio.ListStore.new(Torrent)
+        self.torrent_index = TorrentIndex(self.torrents)
+        self.torrent_facets = TorrentFacets(self.torrents)
         self._encoder = TorrentEncoder()
+        self._coalescer = RequestCoalescer(self._send_coalesced)
         self._session = Soup.Session.new()
+        if not self._session.has_feature(Soup.ContentDecoder):
+            self._session.add_feature_by_type(Soup.ContentDecoder)
+        self.bind_property('max-connections', self._session, 'max-conns-per-host',
+                           GObject.BindingFlags.SYNC_CREATE)
+        self.bind_property('idle-timeout', self._session, 'idle-timeout', GObject.BindingFlags.SYNC_CREATE)
         self._rpc_uri = self._get_rpc_uri()
-        self._session_id = '0'
+        self._session_id = None  # Unknown until the probe gets it
+        self._probe = None
+        self._sequence = 0
+        self._in_flight = {}  # Sequence number -> sent message
+        self._gated = []  # (message, callback) waiting for a session id
+        self._retrying = []  # (message, callback) rejected for an outdated session id
+        self._backoff = {}  # Sequence number -> (message, callback, source id) waiting to be retried
+        self._policy = RequestPolicy()
+        self.bind_property('request-timeout', self._policy, 'timeout', GObject.BindingFlags.SYNC_CREATE)
+        self.bind_property('max-retries', self._policy, 'max-retries', GObject.BindingFlags.SYNC_CREATE)
+        self._breaker = CircuitBreaker()
+        self._circuit_paused = False  # Refreshes were paused by the circuit opening
+        self._breaker.connect('notify::state', self._on_circuit_state_changed)
+        self._breaker.connect('probe', self._on_circuit_probe)
+        self._rpc_version = 0
         self._session.connect('authenticate', self._on_authenticate)
         self._refresh_timer = None
         self._session_timer = None
+        self._refreshed_count = 0
+        self._poll_message = None  # In flight recently-active torrent-get
+        self._stats_message = None
+        self._poll_serial = 0
+        self._applied_serial = 0
+        self._supersede_poll = False
 
         network_monitor = Gio.NetworkMonitor.get_default()
         network_monitor.connect('network-changed', self._on_network_changed)
@@ -131,17 +219,23 @@ class Client(GObject.Object):
         self.download_dir = ''
         self.upload_speed = 0
         self.download_speed = 0
+        self.bytes_received = 0
+        self.bytes_transferred = 0
+        self.stale = False
+        # RPC URI the torrent list came from, None until a full refresh of the current one completes
+        self._list_uri = None
 
         self._last_auth = (self.username, self.password) # Not ideal
         if self.username and self.password:
             self._session.add_feature_by_type(Soup.AuthBasic)
+        self._load_snapshot()
         self.refresh_all()
 
     def do_get_property(self, prop):
-        return getattr(self, prop.name.replace('-', '_'))
+        return getattr(self, self._codec.attributes[prop.name])
 
     def do_set_property(self, prop, value):
-        setattr(self, prop.name.replace('-', '_'), value)
+        setattr(self, self._codec.attributes[prop.name], value)
 
     @property
     def is_local(self):
@@ -155,7 +249,7 @@ class Client(GObject.Object):
             self._last_auth = new_auth
             if self.username and self.password:
                 self._session.add_feature_by_type(Soup.AuthBasic)
-            self.refresh_all(remove=True)
+            self.refresh_all(reconnect=True)
 
     def _get_rpc_uri(self):
         protocol = 'https' if self.tls else 'http'
@@ -168,8 +262,14 @@ class Client(GObject.Object):
         if rpc_uri != self._rpc_uri:
             logging.info('Server information changed')
             self._rpc_uri = rpc_uri
-            self._session_id = '0'
-            self.refresh_all(remove=True)
+            self._rpc_version = 0
+            # The list still belongs to the old server until refreshed
+            self._list_uri = None
+            self._coalescer.cancel()
+            self._cancel_requests()
+            self._circuit_paused = False
+            self._breaker.reset()
+            self.refresh_all(reconnect=True)
 
     def _on_authenticate(self, session, message, auth, retrying):
         if not retrying and self.username and self.password:
@@ -185,60 +285,350 @@ class Client(GObject.Object):
             return
 
         if not available:
-            self.torrents.remove_all()
+            # Torrents are kept so reconnecting only has to apply the difference
+            self.props.connected = False
+            self._pause_timers()
+        else:
+            # Failures so far were likely from the network being down
+            self._circuit_paused = False
+            self._breaker.reset()
+            self.refresh_all()
+
+    def _pause_timers(self):
+        if self._refresh_timer is not None:
             self._refresh_timer.pause()
+        if self._session_timer is not None:
             self._session_timer.pause()
-        else:
+
+    def _on_circuit_state_changed(self, breaker, pspec):
+        state = breaker.props.state
+        if state == CircuitState.OPEN and not self._circuit_paused:
+            logging.warning('Server is not responding, pausing refreshes')
+            self._circuit_paused = True
+            self.props.connected = False
+            self._pause_timers()
+        elif state == CircuitState.CLOSED and self._circuit_paused:
+            logging.info('Server is responding again')
+            self._circuit_paused = False
             self.refresh_all()
 
+    def _on_circuit_probe(self, breaker):
+        self._make_request_async('session-get', {'fields': ['rpc-version']}, probe=True)
+
+    def _start_timeout(self, message):
+        message._activity = GLib.get_monotonic_time()
+        message._timeout_id = GLib.timeout_add_seconds(self._policy.timeout, self._on_message_timeout, message)
+
+    @staticmethod
+    def _stop_timeout(message):
+        if message._timeout_id:
+            GLib.source_remove(message._timeout_id)
+            message._timeout_id = 0
+
+    def _on_message_timeout(self, message):
+        # Data arriving pushes the deadline back so large responses are not cut off
+        idle = (GLib.get_monotonic_time() - message._activity) // GLib.USEC_PER_SEC
+        if idle < self._policy.timeout:
+            message._timeout_id = GLib.timeout_add_seconds(self._policy.timeout - idle,
+                                                           self._on_message_timeout, message)
+            return GLib.SOURCE_REMOVE
+
+        message._timeout_id = 0
+        logging.warning('{} timed out after {}s'.format(message._method, idle))
+        self._session.cancel_message(message, Soup.Status.IO_ERROR)
+        return GLib.SOURCE_REMOVE
+
+    def _probe_session_id(self):
+        """Sends one small request to learn the session id, others wait for it"""
+        if self._probe is not None:
+            return
+        logging.debug('Probing for session id')
+        self._probe = self._new_message({'method': 'session-get', 'arguments': {'fields': ['rpc-version']}})
+        self._probe._method = 'session-get'
+        self._start_timeout(self._probe)
+        self._session.queue_message(self._probe, self._on_probe_finish, None)
+
+    def _on_probe_finish(self, session, message, user_data=None):
+        self._stop_timeout(message)
+        if message is not self._probe:
+            return  # Cancelled by a server change
+        self._probe = None
+
+        status_code = message.props.status_code
+        if is_transient(status_code):
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+        session_id = message.props.response_headers.get_one('X-Transmission-Session-Id')
+        if status_code == Soup.Status.CONFLICT or 200 <= status_code < 300:
+            logging.info('Got session id ({})'.format(session_id))
+        else:
+            # Let the waiting requests go out and fail, or be retried, on their own
+            logging.warning('Failed to get session id: {} ({})'.format(Soup.Status(status_code).value_name,
+                                                                       status_code))
+        self._session_id = session_id or ''
+        self._release_gate()
+
+    def _queue_message(self, message, callback):
+        """Sends message once the session id is known, in the order they were made"""
+        self._sequence += 1
+        message._sequence = self._sequence
+        if not self._breaker.allow_request(probe=message._circuit_probe):
+            logging.debug('Circuit is open, not sending {}'.format(message._method))
+            message.set_status(Soup.Status.CANT_CONNECT)
+            # Callers expect to get the message back before it finishes
+            GLib.idle_add(self._finish_message, message, callback)
+        elif self._session_id is None or self._retrying:
+            self._gated.append((message, callback))
+            if self._session_id is None:
+                self._probe_session_id()
+        else:
+            self._send_message(message, callback)
+
+    def _send_message(self, message, callback):
+        message.props.request_headers.replace('X-Transmission-Session-Id', self._session_id)
+        message._sent_session_id = self._session_id
+        message._received = 0
+        self._in_flight[message._sequence] = message
+        self._start_timeout(message)
+        self._session.queue_message(message, self._on_message_finish, user_data=callback)
+
+    def _release_gate(self):
+        if self._session_id is None:
+            return
+        # Messages still in flight with the old id will need a retry too, wait to keep them in order
+        if any(message._sent_session_id != self._session_id for message in self._in_flight.values()):
+            return
+
+        waiting = sorted(self._retrying + self._gated, key=lambda item: item[0]._sequence)
+        if self._retrying:
+            logging.info('Retrying {} requests with new session id'.format(len(self._retrying)))
+        self._retrying = []
+        self._gated = []
+        for message, callback in waiting:
+            self._send_message(message, callback)
+
+    def _retry_later(self, message, callback) -> bool:
+        """Schedules a failed message to be sent again if the policy allows it"""
+        # Streamed items were already handed out and can't be taken back
+        if message._delivered:
+            return False
+        delay = self._policy.retry_delay(message._method, message.props.status_code, message._attempt)
+        if delay is None:
+            return False
+        if message._decoder is not None:
+            # It may hold the start of a response that was cut off
+            message._decoder = TorrentStreamDecoder()
+
+        message._attempt += 1
+        logging.info('Retrying {} in {:.1f}s (attempt {})'.format(message._method, delay, message._attempt))
+        source_id = GLib.timeout_add(int(delay * 1000), self._on_retry_timeout, message._sequence)
+        self._backoff[message._sequence] = (message, callback, source_id)
+        return True
+
+    def _on_retry_timeout(self, sequence):
+        message, callback, _source_id = self._backoff.pop(sequence)
+        self._queue_message(message, callback)
+        return GLib.SOURCE_REMOVE
+
+    def _cancel_message(self, message):
+        waiting = self._backoff.pop(message._sequence, None)
+        if waiting is not None:
+            GLib.source_remove(waiting[2])
+            message.set_status(Soup.Status.CANCELLED)
+            self._finish_message(message, waiting[1])
+            return
+        for waiting in (self._gated, self._retrying):
+            for i, (waiting_message, callback) in enumerate(waiting):
+                if waiting_message is message:
+                    del waiting[i]
+                    message.set_status(Soup.Status.CANCELLED)
+                    self._finish_message(message, callback)
+                    return
+        self._session.cancel_message(message, Soup.Status.CANCELLED)
+
+    def _cancel_requests(self):
+        """Cancels everything sent or waiting to be sent, the next request gets a new session id"""
+        self._session_id = None
+        probe, self._probe = self._probe, None
+        if probe is not None:
+            self._session.cancel_message(probe, Soup.Status.CANCELLED)
+
+        waiting = self._retrying + self._gated
+        for message, callback, source_id in self._backoff.values():
+            GLib.source_remove(source_id)
+            waiting.append((message, callback))
+        self._retrying = []
+        self._gated = []
+        self._backoff = {}
+        for message in list(self._in_flight.values()):
+            self._session.cancel_message(message, Soup.Status.CANCELLED)
+        for message, callback in waiting:
+            message.set_status(Soup.Status.CANCELLED)
+            self._finish_message(message, callback)
+
     def _on_message_finish(self, session, message, user_data=None):
+        self._in_flight.pop(message._sequence, None)
+        self._stop_timeout(message)
         status_code = message.props.status_code
         logging.debug('Got response code: {} ({})'.format(Soup.Status(status_code).value_name, status_code))
 
-        if status_code == Soup.Status.UNAUTHORIZED:
+        if is_transient(status_code):
+            self._breaker.record_failure()
+            # A failed probe only reopens the breaker, the next one comes after its cooldown
+            if not message._circuit_probe and self._retry_later(message, user_data):
+                # requeue_message fails?
+                self._session.cancel_message(message, Soup.Status.CANCELLED)
+                return
+        elif status_code >= 100:
+            # The server answered, even if with an error
+            self._breaker.record_success()
+        elif message._circuit_probe and status_code != Soup.Status.CANCELLED:
+            # Otherwise a half-open breaker would wait for this probe forever
+            self._breaker.record_failure()
+
+        if status_code == Soup.Status.CONFLICT:
+            session_id = message.props.response_headers.get_one('X-Transmission-Session-Id')
+            if session_id != self._session_id:
+                logging.info('Session id changed ({}), retrying'.format(session_id))
+                self._session_id = session_id
+            # requeue_message fails?
+            self._session.cancel_message(message, Soup.Status.CANCELLED)
+            self._retrying.append((message, user_data))
+            self._release_gate()
+            return
+
+        self._finish_message(message, user_data)
+        if self._retrying:
+            self._release_gate()
+
+    def _finish_message(self, message, callback):
+        startup_profile.mark('first RPC response')
+        self._count_bytes(message)
+        try:
+            self._handle_response(message, callback)
+        finally:
+            done = getattr(message, '_done', None)
+            if done is not None:
+                done()
+
+    def _handle_response(self, message, callback):
+        status_code = message.props.status_code
+        if status_code == Soup.Status.CANCELLED:
+            return
+        elif status_code == Soup.Status.UNAUTHORIZED:
             if not self.username or not self.password:
                 logging.warning('Requires authentication')
             else:
                 logging.warning('Failed to log in as {}'.format(self.username))
-        elif status_code == Soup.Status.CONFLICT:
-            self._session_id = message.props.response_headers.get('X-Transmission-Session-Id')
-            logging.info('Got new session id ({}), retrying'.format(self._session_id))
-            message.props.request_headers.replace('X-Transmission-Session-Id', self._session_id)
-            # requeue_message fails?
-            self._session.cancel_message(message, Soup.Status.CANCELLED)
-            self._session.queue_message(message, self._on_message_finish, user_data=user_data)
 
         if not 200 <= status_code < 300:
             logging.warning('Response was not successful: {} ({})'.format(Soup.Status(status_code).value_name,
                                                                           status_code))
             return
 
-        response_str = message.props.response_body_data.get_data().decode('UTF-8')
-        response = json.loads(response_str)
-        logging.debug('<<<\n{}'.format(pprint.pformat(response)))
+        decoder = getattr(message, '_decoder', None)
+        try:
+            if decoder is not None:
+                response = decoder.finish()
+            else:
+                response_data = message.props.response_body_data.get_data()
+                rpc_trace.trace('<<<', response_data)
+                response = json.loads(response_data.decode('UTF-8'))
+        except ValueError as e:
+            logging.warning('Failed to decode response: {}'.format(e))
+            return
 
         if response.get('result') != 'success':
             logging.warning('Request failed: {}'.format(response.get('result')))
             return
 
-        if user_data:
-            user_data(response)
+        if callback:
+            callback(response)
+
+    def _count_bytes(self, message):
+        if message.props.status_code < 100:  # Cancelled or never got a response
+            return
 
-    def _make_request_async(self, method, arguments=None, callback=None, tag=None):
+        received = message._received
+        headers = message.props.response_headers
+        encoding = headers.get_one('Content-Encoding') or 'identity'
+        self.bytes_received += received
+        self.notify('bytes-received')
+
+        # Chunks arrive already decoded, so only a Content-Length tells how much
+        # was on the wire. Without one (chunked and compressed) it stays unknown.
+        if headers.get_encoding() != Soup.Encoding.CONTENT_LENGTH:
+            rpc_trace.logger.debug('%s: received %d bytes, transferred size unknown (%s)',
+                                   message._method, received, encoding)
+            return
+
+        transferred = headers.get_content_length()
+        rpc_trace.logger.debug('%s: received %d bytes, %d bytes transferred (%s)',
+                               message._method, received, transferred, encoding)
+        self.bytes_transferred += transferred
+        self.notify('bytes-transferred')
+
+    @staticmethod
+    def _on_message_got_body_chunk(message, chunk):
+        message._received += chunk.length
+        message._activity = GLib.get_monotonic_time()
+
+    @staticmethod
+    def _on_message_got_chunk(message, chunk, item_callback):
+        if not 200 <= message.props.status_code < 300:
+            return
+
+        data = chunk.get_as_bytes().get_data()
+        rpc_trace.trace('<<<', data)
+        items = message._decoder.feed(data)
+        if items:
+            message._delivered = True
+            item_callback(items)
+
+    def _new_message(self, request: dict) -> Soup.Message:
         message = Soup.Message.new('POST', self._rpc_uri)
-        message.props.request_headers.append('X-Transmission-Session-Id', self._session_id)
+        if not self.keep_alive:
+            message.props.request_headers.append('Connection', 'close')
 
+        request_data = bytes(self._encoder.encode(request), 'UTF-8')
+        rpc_trace.trace('>>>', request_data)
+        message.set_request('application/json', Soup.MemoryUse.COPY, request_data)
+        return message
+
+    def _make_request_async(self, method, arguments=None, callback=None, tag=None, item_callback=None,
+                            done=None, probe=False) -> Soup.Message:
+        """
+        :param item_callback: For torrent-get, called with each batch of torrents as
+            they are received. The response passed to callback then has an empty torrents list.
+        :param done: Called once the request is finished, whether it succeeded or not
+        :param probe: Checks if the server is back, sent while the circuit is half open
+        """
         request = {'method': method}
         if arguments:
             request['arguments'] = arguments
         if tag:
             request['tag'] = tag
-
-        logging.debug('>>>\n{}'.format(pprint.pformat(request)))
-        message.set_request('application/json', Soup.MemoryUse.COPY,
-                            bytes(self._encoder.encode(request), 'UTF-8'))
-
-        self._session.queue_message(message, self._on_message_finish, user_data=callback)
+        message = self._new_message(request)
+
+        message._decoder = None
+        message._delivered = False  # If item_callback got anything
+        if item_callback is not None:
+            message._decoder = TorrentStreamDecoder()
+            message.props.response_body.set_accumulate(False)
+            message.connect('got-chunk', self._on_message_got_chunk, item_callback)
+        message._done = done
+        message._method = method
+        message._attempt = 0
+        message._timeout_id = 0
+        message._circuit_probe = probe
+        message.connect('got-chunk', self._on_message_got_body_chunk)
+
+        self._queue_message(message, callback)
+        return message
+
+    def _send_coalesced(self, method, arguments, callback, done):
+        self._make_request_async(method, arguments, callback=callback, done=done)
 
     @staticmethod
     def _make_args(torrent, **kwargs):
@@ -253,13 +643,13 @@ class Client(GObject.Object):
         return args
 
     def session_get(self, callback=None):
-        self._make_request_async('session-get', None, callback=callback)
+        self._coalescer.session_get(callback)
 
     def session_set(self, arguments, callback=None):
         self._make_request_async('session-set', arguments, callback=callback)
 
-    def session_stats(self, callback=None):
-        self._make_request_async('session-stats', None, callback=callback)
+    def session_stats(self, callback=None, done=None):
+        return self._make_request_async('session-stats', None, callback=callback, done=done)
 
     def torrent_start(self, torrent):
         """
@@ -287,9 +677,41 @@ class Client(GObject.Object):
         args = {'location': location, 'move': True}  # Expose move option?
         self._make_request_async('torrent-set-location', self._make_args(torrent, args=args))
 
-    def torrent_get(self, torrent, fields, callback=None):
+    def torrent_get(self, torrent, fields, callback=None, item_callback=None, done=None):
+        """
+        :param item_callback: Stream the torrents, see _make_request_async(). These are
+            requested in the table format if the server supports it and are passed as
+            read-only mappings.
+
+        Plain requests are coalesced with others made around the same time and
+        return None instead of the message.
+        """
+        if item_callback is None and done is None and torrent != 'recently-active':
+            self._coalescer.torrent_get(torrent, fields, callback)
+            return None
+
         args = self._make_args(torrent, fields=fields)
-        self._make_request_async('torrent-get', args, callback=callback)
+        if item_callback is not None and self._rpc_version >= _TABLE_FORMAT_RPC_VERSION:
+            args['format'] = 'table'
+            table = TableDecoder()
+
+            def on_items(items):
+                rows = table.decode(items)
+                if rows:
+                    item_callback(rows)
+
+            def on_response(response):
+                arguments = response['arguments']
+                arguments['torrents'] = table.decode(arguments['torrents'])
+                rpc_trace.logger.debug('Table format saved about %d bytes', table.bytes_saved)
+                if callback:
+                    callback(response)
+
+            return self._make_request_async('torrent-get', args, callback=on_response, item_callback=on_items,
+                                            done=done)
+        else:
+            return self._make_request_async('torrent-get', args, callback=callback, item_callback=item_callback,
+                                            done=done)
 
     def torrent_move(self, torrent, location: str, move=None):
         args = self._make_args(torrent, location=location, move=move)
@@ -303,13 +725,21 @@ class Client(GObject.Object):
         def on_add(response):
             new_torrent = response['arguments'].get('torrent-added')
             if new_torrent:
-                torrent = Torrent(id=new_torrent['id'], name=new_torrent['name'])
-                self.torrents.append(torrent)
-                self.torrent_get(new_torrent['id'], _REFRESH_ALL_LIST)
+                # A poll may have added it already
+                if self.torrent_index.get(new_torrent['id']) is None:
+                    torrent = Torrent(id=new_torrent['id'], name=new_torrent['name'])
+                    self.torrents.append(torrent)
+                self.torrent_get(new_torrent['id'], _REFRESH_ALL_LIST, callback=self._on_added_torrent_get)
             if callback:
                 callback(response)
         self._make_request_async('torrent-add', args, callback=on_add)
 
+    def _on_added_torrent_get(self, response):
+        for t in response['arguments']['torrents']:
+            torrent = self.torrent_index.get(t['id'])
+            if torrent is not None:
+                torrent.update_from_response(t)
+
     def _show_notification(self, torrent: Torrent):
         notification = Gio.Notification.new(_('Download completed'))
         notification.set_body(torrent.props.name + _(' has finished downloading.'))
@@ -322,55 +752,148 @@ class Client(GObject.Object):
             # TODO: Combine repeated notifications
             application.send_notification(None, notification)
 
-    def _on_refresh_complete(self, response):
-        for t in response['arguments']['torrents']:
-            for i in range(self.torrents.get_n_items()):
-                torrent = self.torrents.get_item(i)
-                if torrent.id == t['id']:
-                    # If it was downloading but is now seeding or is finished
-                    # show a notification
-                    if torrent.status == TorrentStatus.DOWNLOAD and \
-                       (t['status'] in (TorrentStatus.SEED, TorrentStatus.SEED_WAIT) or t.get('isFinished')):
-                        self._show_notification(torrent)
-                    torrent.update_from_response(t)
-                    break
+    def _accept_poll(self, serial: int, force=False) -> bool:
+        """Returns if results of poll serial are newer than the ones already applied"""
+        if serial < self._applied_serial and not force:
+            logging.debug('Dropping results of outdated poll {}'.format(serial))
+            return False
+        self._applied_serial = max(self._applied_serial, serial)
+        return True
+
+    def _on_refresh_complete(self, serial, response):
+        self._on_refresh_items(serial, response['arguments']['torrents'])
+        if not self._accept_poll(serial):
+            return
+        removed = response['arguments']['removed']
+        self.torrent_index.remove(removed)
+        # Nothing recently active means we can poll less often
+        self._refresh_timer.report_activity(bool(self._refreshed_count or removed))
+
+    def _on_refresh_items(self, serial, torrents: list):
+        if not self._accept_poll(serial):
+            return
+        self._refreshed_count += len(torrents)
+        new_torrents = []
+        for t in torrents:
+            torrent = self.torrent_index.get(t['id'])
+            if torrent is not None:
+                self._update_torrent(torrent, t)
             else:
-                torrent = Torrent.new_from_response(t)
-                self.torrents.append(torrent)
+                new_torrents.append(Torrent.new_from_response(t))
+
+        self._append_torrents(new_torrents)
+
+    def _update_torrent(self, torrent: Torrent, t: dict):
+        if torrent.stale:
+            # Whatever finished while we were not running is old news
+            torrent.props.stale = False
+        # If it was downloading but is now seeding or is finished
+        # show a notification
+        elif torrent.status == TorrentStatus.DOWNLOAD and \
+                (t.get('status') in (TorrentStatus.SEED, TorrentStatus.SEED_WAIT) or t.get('isFinished')):
+            self._show_notification(torrent)
+        torrent.update_from_response(t)
+
+    def _append_torrents(self, torrents: list):
+        if torrents:
+            self.torrents.splice(self.torrents.get_n_items(), 0, torrents)
+
+    def _reconcile(self, serial: int, kept: set, added: list, torrents: list):
+        """
+        Updates the torrent list in place with part of a full torrent-get response
 
-        for t in response['arguments']['removed']:
-            for i in range(self.torrents.get_n_items() - 1, 0, -1):
-                if self.torrents.get_item(i).id == t:
-                    self.torrents.remove(i)
+        :param kept: Ids seen so far in the response, anything not in it once
+            the response is complete gets removed
+        :param added: Torrents not in the list yet, they are added in batches of
+            _ADD_BATCH_SIZE and the rest once the response is complete
+        """
+        # The full list is always applied but makes older polls outdated
+        self._accept_poll(serial, force=True)
+        replaced = []
+        for t in torrents:
+            torrent = self.torrent_index.get(t['id'])
+            # Ids are not stable across daemon restarts, the hash is
+            hash_string = t.get('hashString')
+            known_hash = torrent.hash_string if torrent is not None else None
+            if torrent is not None and (not hash_string or not known_hash or hash_string == known_hash):
+                self._update_torrent(torrent, t)
+            else:
+                if torrent is not None:
+                    replaced.append(torrent.id)
+                added.append(Torrent.new_from_response(t))
+            kept.add(t['id'])
+
+        self.torrent_index.remove(replaced)
+        if len(added) >= _ADD_BATCH_SIZE:
+            self._add_batch(added)
+
+    def _add_batch(self, added: list):
+        # A poll that ran meanwhile may have added some of them first, with
+        # fewer fields than a full refresh asks for
+        self.torrent_index.remove([torrent.id for torrent in added if torrent.id in self.torrent_index])
+        self._append_torrents(added)
+        del added[:]
 
     def _refresh(self):
-        self.torrent_get('recently-active', ['id', 'name', 'rateDownload', 'rateUpload', 'eta',
-                                             'sizeWhenDone', 'percentDone', 'totalSize', 'status',
-                                             'isFinished', 'error'],
-                         callback=self._on_refresh_complete)
-        self.session_stats(self._on_refresh_stats_complete)
+        supersede = self._supersede_poll
+        self._supersede_poll = False
+
+        if self._poll_message is not None:
+            if not supersede:
+                logging.debug('Previous refresh still in flight, skipping')
+            else:
+                # Changes made by the user are only in the response to a new request
+                logging.debug('Cancelling refresh superseded by a new one')
+                self._cancel_message(self._poll_message)
+                self._poll_message = None
+
+        if self._poll_message is None:
+            self._poll_serial += 1
+            serial = self._poll_serial
+            self._refreshed_count = 0
+
+            def on_done():
+                if self._poll_message is not None and self._poll_message._serial == serial:
+                    self._poll_message = None
+
+            self._poll_message = self.torrent_get('recently-active', _REFRESH_LIST,
+                                                  callback=partial(self._on_refresh_complete, serial),
+                                                  item_callback=partial(self._on_refresh_items, serial),
+                                                  done=on_done)
+            self._poll_message._serial = serial
+
+        self._refresh_stats()
+
+    def _refresh_stats(self):
+        if self._stats_message is not None:
+            return
+
+        def on_done():
+            self._stats_message = None
+
+        self._stats_message = self.session_stats(self._on_refresh_stats_complete, done=on_done)
 
     def _on_refresh_stats_complete(self, response):
-        for prop, value in response['arguments'].items():
-            prop_name = Torrent._propertify_name(prop)
-            if hasattr(self.props, prop_name):
-                setattr(self, prop_name.replace('-', '_'), value)
-                self.notify(prop_name)
+        self._codec.update(self, response['arguments'])
 
     def _on_refresh_session_complete(self, response):
-        for prop, value in response['arguments'].items():
-            if hasattr(self.props, prop):
-                setattr(self, prop.replace('-', '_'), value)
-                self.notify(prop)
+        self._rpc_version = response['arguments'].get('rpc-version', 0)
+        self._codec.update(self, response['arguments'])
 
     def _refresh_session(self):
         self.session_get(self._on_refresh_session_complete)
 
-    def _on_refresh_all_complete(self, response):
-        self.torrents.remove_all()
-        for t in response['arguments']['torrents']:
-            torrent = Torrent.new_from_response(t)
-            self.torrents.append(torrent)
+    def _on_refresh_all_complete(self, serial, kept, added, rpc_uri, response):
+        self._reconcile(serial, kept, added, response['arguments']['torrents'])
+        self.torrent_index.remove([torrent_id for torrent_id in self.torrent_index
+                                   if torrent_id not in kept])
+        self._add_batch(added)
+        if rpc_uri == self._rpc_uri:
+            self._list_uri = rpc_uri
+        if self.stale:
+            self.stale = False
+            self.notify('stale')
+        self.save_snapshot()
 
         if self._refresh_timer is None:
             self._refresh_timer = Timer(self._refresh, timeout=self.timeout)
@@ -379,26 +902,63 @@ class Client(GObject.Object):
             self._refresh_timer.resume()
 
         if self._session_timer is None:
-            self._session_timer = Timer(self._refresh_session, timeout=300)
+            self._session_timer = Timer(self._refresh_session, timeout=300, jitter=0)
         else:
             self._session_timer.resume()
 
         self.props.connected = True
 
+    def _load_snapshot(self):
+        rows = snapshot.load(snapshot.get_path(self.hostname, self.port))
+        if not rows:
+            return
+        torrents = []
+        for row in rows:
+            torrent = Torrent.new_from_response(row)
+            torrent.stale = True
+            torrents.append(torrent)
+        logging.info('Loaded {} torrents from snapshot'.format(len(torrents)))
+        self._append_torrents(torrents)
+        self.stale = True
+        self.notify('stale')
+
+    def save_snapshot(self):
+        """Stores the torrent list so the next start can show it right away"""
+        if self.stale:
+            return  # Nothing new to store
+        if self._list_uri != self._rpc_uri:
+            return  # Not fully loaded from this server yet
+        snapshot.save(snapshot.get_path(self.hostname, self.port), ListStore(self.torrents),
+                      _REFRESH_ALL_LIST, Torrent._codec)
+
     def refresh(self):
         """Refresh the list one time in the near future"""
         if self._refresh_timer:
+            self._supersede_poll = True
             self._refresh_timer.run_once()
 
-    def refresh_all(self, remove=False):
-        if remove:
+    def refresh_all(self, reconnect=False):
+        """
+        Fetch the full torrent list and reconcile it with the current one
+
+        :param reconnect: Consider the client disconnected until it completes
+        """
+        if reconnect:
             self.props.connected = False
-            self.torrents.remove_all()
+        # Learn the rpc-version early so polls can use the table format
+        self._refresh_session()
+        self._poll_serial += 1
+        serial = self._poll_serial
+        kept = set()
+        added = []
         self.torrent_get(None, _REFRESH_ALL_LIST,
-                         callback=self._on_refresh_all_complete)
+                         callback=partial(self._on_refresh_all_complete, serial, kept, added, self._rpc_uri),
+                         item_callback=partial(self._reconcile, serial, kept, added))
         if self._refresh_timer:
-            # FIXME: Don't want to send too much until we have initial session id
-            self.session_stats(self._on_refresh_stats_complete)
+            self._refresh_stats()
+
+
+Client._codec = PropertyCodec(Client)
 
 
 class TorrentEncoder(json.JSONEncoder):
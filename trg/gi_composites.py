@@ -26,6 +26,8 @@ from gi.repository import GLib
 from gi.repository import GObject
 from gi.repository import Gtk
 
+from . import startup_profile
+
 __all__ = ['GtkTemplate']
 
 class GtkTemplateWarning(UserWarning):
@@ -236,6 +238,10 @@ class _GtkTemplate(object):
         self.ui = ui
 
     def __call__(self, cls):
+        with startup_profile.measure('template registration'):
+            return self._init_class(cls)
+
+    def _init_class(self, cls):
 
         if not issubclass(cls, Gtk.Widget):
             raise TypeError("Can only use @GtkTemplate on Widgets")
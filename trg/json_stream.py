@@ -0,0 +1,129 @@
+# json_stream.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import json
+import codecs
+from collections.abc import Mapping
+
+
+class TorrentStreamDecoder:
+    """
+    Incrementally decodes a torrent-get response
+
+    Every element of the torrents array is returned from feed() as soon as it
+    is complete, the rest of the response is returned by finish() with an
+    empty torrents array.
+    """
+    _ARRAY_START = re.compile(r'"torrents"\s*:\s*\[')
+    _WHITESPACE = re.compile(r'[ \t\n\r,]*')
+
+    def __init__(self):
+        self._utf8 = codecs.getincrementaldecoder('UTF-8')()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._prefix = None  # Response up to and including the start of the array
+        self._array_done = False
+
+    def feed(self, data: bytes) -> list:
+        """Adds a chunk of the body and returns the torrents completed by it"""
+        self._buffer += self._utf8.decode(data)
+        return self._parse()
+
+    def finish(self) -> dict:
+        """Returns the response without the streamed torrents"""
+        self._buffer += self._utf8.decode(b'', final=True)
+        self._parse()
+        if self._prefix is None:
+            return json.loads(self._buffer)
+        if not self._array_done:
+            raise ValueError('Response ended inside of the torrents array')
+        return json.loads(self._prefix + self._buffer)
+
+    def _parse(self) -> list:
+        items = []
+        if self._prefix is None:
+            match = self._ARRAY_START.search(self._buffer)
+            if not match:
+                return items
+            self._prefix = self._buffer[:match.end()]
+            self._buffer = self._buffer[match.end():]
+
+        if self._array_done:
+            return items
+
+        buf = self._buffer
+        pos = 0
+        while True:
+            pos = self._WHITESPACE.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            if buf[pos] == ']':
+                self._array_done = True
+                break
+            try:
+                item, pos = self._decoder.raw_decode(buf, pos)
+            except ValueError:
+                break  # Incomplete, wait for more data
+            items.append(item)
+
+        self._buffer = buf[pos:]
+        return items
+
+
+class TableRow(Mapping):
+    """Read only mapping over one row of a table format torrent-get response"""
+    __slots__ = ('_columns', '_values')
+
+    def __init__(self, columns: dict, values: list):
+        self._columns = columns
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._columns[key]]
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+
+class TableDecoder:
+    """
+    Turns the elements of a table format torrent array into TableRows
+
+    The first element is the list of field names, every following one holds
+    the values in that order so each field name is only sent once.
+    """
+    def __init__(self):
+        self.columns = None
+        self.bytes_saved = 0  # Estimate of how much the object format would have added
+        self._row_overhead = 0
+
+    def decode(self, items: list) -> list:
+        rows = []
+        for item in items:
+            if self.columns is None:
+                self.columns = {key: i for i, key in enumerate(item)}
+                # Every object repeats "key": for each field
+                self._row_overhead = sum(len(key) + 3 for key in item)
+                self.bytes_saved -= self._row_overhead
+                continue
+            rows.append(TableRow(self.columns, item))
+        self.bytes_saved += self._row_overhead * len(rows)
+        return rows
@@ -0,0 +1,246 @@
+# list_tree_model.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from array import array
+
+from gi.repository import GLib, GObject, Gtk, Gio
+
+_GTYPES = {
+    str: GObject.TYPE_STRING,
+    float: GObject.TYPE_DOUBLE,
+    int: GObject.TYPE_INT64,
+    bool: GObject.TYPE_BOOLEAN,
+}
+
+# Columns of these types are kept in arrays, anything else in lists
+_TYPECODES = {
+    GObject.TYPE_DOUBLE: 'd',
+    GObject.TYPE_FLOAT: 'd',
+    GObject.TYPE_INT: 'i',
+    GObject.TYPE_UINT: 'I',
+    GObject.TYPE_INT64: 'q',
+    GObject.TYPE_UINT64: 'Q',
+    GObject.TYPE_BOOLEAN: 'b',
+}
+
+
+class ListTreeModel(GObject.Object, Gtk.TreeModel):
+    """
+    Presents the properties of the items of a Gio.ListModel as a Gtk.TreeModel
+
+    The values shown are kept per column in compact arrays, they are only
+    turned into GValues when a view asks for them and rows only emit
+    row-changed when one of them actually changed. The last column is
+    the item itself.
+    """
+
+    __gsignals__ = {
+        'rebuild-started': (GObject.SignalFlags.RUN_FIRST, None, ()),
+        'rebuild-finished': (GObject.SignalFlags.RUN_FIRST, None, ()),
+    }
+
+    # Changes adding at least this many rows are done as a single rebuild
+    # which views can use to detach themselves until it is finished
+    BULK_THRESHOLD = 200
+
+    def __init__(self, model: Gio.ListModel, properties_map):
+        """
+        :param properties_map: Ordered Dict of property names and types to map
+        """
+        super().__init__()
+        self.properties = list(properties_map.keys())
+        self._attributes = [prop.replace('-', '_') for prop in self.properties]
+        self._types = [_GTYPES.get(t, t) for t in properties_map.values()] + [GObject.TYPE_OBJECT]
+        self._columns = {prop: i for i, prop in enumerate(self.properties)}
+        self._values = [array(_TYPECODES[t]) if t in _TYPECODES else []
+                        for t in self._types[:-1]]
+        self._items = []
+        self._positions = {}  # Item -> row, None when it has to be rebuilt
+        self._stamp = 0  # Changed whenever rows move so older iters are rejected
+        self._dirty = set()  # Items with changed values waiting for row-changed
+        self._flush_id = 0
+
+        self._model = model
+        self._model.connect('items-changed', self._on_items_changed)
+        self._on_items_changed(model, 0, 0, model.get_n_items())
+
+    def _make_iter(self, row: int) -> Gtk.TreeIter:
+        it = Gtk.TreeIter()
+        it.stamp = self._stamp
+        it.user_data = row
+        return it
+
+    @staticmethod
+    def _get_row(it: Gtk.TreeIter) -> int:
+        return it.user_data or 0
+
+    def _check_iter(self, it: Gtk.TreeIter) -> int:
+        """Returns the row of it, raises ValueError if it is from before the rows last moved"""
+        row = self._get_row(it)
+        if it.stamp != self._stamp or not 0 <= row < len(self._items):
+            raise ValueError('Invalid or outdated iter')
+        return row
+
+    @staticmethod
+    def _invalidate_iter(it: Gtk.TreeIter):
+        it.stamp = 0
+        it.user_data = None
+
+    def do_get_flags(self):
+        return Gtk.TreeModelFlags.LIST_ONLY
+
+    def do_get_n_columns(self):
+        return len(self._types)
+
+    def do_get_column_type(self, column):
+        return self._types[column]
+
+    def do_get_iter(self, path):
+        indices = path.get_indices()
+        if len(indices) == 1 and 0 <= indices[0] < len(self._items):
+            return True, self._make_iter(indices[0])
+        return False, None
+
+    def do_get_path(self, it):
+        return Gtk.TreePath.new_from_indices([self._check_iter(it)])
+
+    def do_get_value(self, it, column):
+        row = self._check_iter(it)
+        if column == len(self._values):
+            return GObject.Value(GObject.TYPE_OBJECT, self._items[row])
+        return GObject.Value(self._types[column], self._values[column][row])
+
+    def do_iter_next(self, it):
+        row = self._check_iter(it) + 1
+        if row < len(self._items):
+            it.user_data = row
+            return True
+        self._invalidate_iter(it)
+        return False
+
+    def do_iter_previous(self, it):
+        row = self._check_iter(it) - 1
+        if row >= 0:
+            it.user_data = row
+            return True
+        self._invalidate_iter(it)
+        return False
+
+    def do_iter_children(self, parent):
+        if parent is None and self._items:
+            return True, self._make_iter(0)
+        return False, None
+
+    def do_iter_has_child(self, it):
+        self._check_iter(it)
+        return False
+
+    def do_iter_n_children(self, it):
+        if it is None:
+            return len(self._items)
+        self._check_iter(it)
+        return 0
+
+    def do_iter_nth_child(self, parent, n):
+        if parent is not None:
+            self._check_iter(parent)
+        elif 0 <= n < len(self._items):
+            return True, self._make_iter(n)
+        return False, None
+
+    def do_iter_parent(self, child):
+        return False, None
+
+    def get_item(self, it: Gtk.TreeIter) -> GObject.Object:
+        """Returns the item of a row without going through a GValue"""
+        return self._items[self._check_iter(it)]
+
+    def item_changed(self, item: GObject.Object):
+        """Emits row-changed for the row of item"""
+        row = self._get_position(item)
+        self.row_changed(Gtk.TreePath.new_from_indices([row]), self._make_iter(row))
+
+    def _on_item_property_changed(self, item, paramspec):
+        column = self._columns.get(paramspec.name)
+        if column is None:
+            return
+
+        value = getattr(item, self._attributes[column])
+        values = self._values[column]
+        row = self._get_position(item)
+        if values[row] == value:
+            return
+        values[row] = value
+
+        # Many properties of an item change at once so they
+        # get a single row-changed on the next main loop iteration
+        self._dirty.add(item)
+        if not self._flush_id:
+            self._flush_id = GLib.idle_add(self._flush_dirty)
+
+    def _flush_dirty(self):
+        dirty = self._dirty
+        self._dirty = set()
+        self._flush_id = 0
+
+        for item in dirty:
+            self.item_changed(item)
+
+        return GLib.SOURCE_REMOVE
+
+    def _get_position(self, item) -> int:
+        if self._positions is None:
+            self._positions = {i: row for row, i in enumerate(self._items)}
+        return self._positions[item]
+
+    def _on_items_changed(self, model, position, removed, added):
+        bulk = added >= self.BULK_THRESHOLD
+        if bulk:
+            self.emit('rebuild-started')
+
+        # Iters hold row numbers which are no longer valid
+        self._stamp = self._stamp % 0x7fffffff + 1  # A gint that is never 0
+        # Only appending leaves the rows of existing items as they were
+        if removed or position != len(self._items):
+            self._positions = None
+
+        # From the end so removing many rows does not move the ones after them each time
+        for row in reversed(range(position, position + removed)):
+            self._remove_row(row)
+            self.row_deleted(Gtk.TreePath.new_from_indices([row]))
+
+        for row in range(position, position + added):
+            self._insert_row(row, model.get_item(row))
+            self.row_inserted(Gtk.TreePath.new_from_indices([row]), self._make_iter(row))
+
+        if bulk:
+            self.emit('rebuild-finished')
+
+    def _remove_row(self, row: int):
+        item = self._items.pop(row)
+        item.disconnect(item._hook_id)
+        self._dirty.discard(item)
+        for values in self._values:
+            del values[row]
+
+    def _insert_row(self, row: int, item: GObject.Object):
+        self._items.insert(row, item)
+        for attribute, values in zip(self._attributes, self._values):
+            values.insert(row, getattr(item, attribute))
+        if self._positions is not None:
+            self._positions[item] = row
+        item._hook_id = item.connect('notify', self._on_item_property_changed)
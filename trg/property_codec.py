@@ -0,0 +1,108 @@
+# property_codec.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+
+from gi.repository import GObject
+
+Field = namedtuple('Field', ('pspec', 'attribute', 'coerce', 'setter'))
+
+_COERCERS = {
+    GObject.TYPE_STRING: str,
+    GObject.TYPE_BOOLEAN: bool,
+    GObject.TYPE_DOUBLE: float,
+    GObject.TYPE_FLOAT: float,
+    GObject.TYPE_INT: int,
+    GObject.TYPE_UINT: int,
+    GObject.TYPE_LONG: int,
+    GObject.TYPE_ULONG: int,
+    GObject.TYPE_INT64: int,
+    GObject.TYPE_UINT64: int,
+}
+
+
+def propertify_name(name: str) -> str:
+    """Converts a transmission property name to a gobject style one"""
+    return ''.join('-' + c.lower() if c.isupper() else c for c in name)
+
+
+class PropertyCodec:
+    """
+    Maps transmission field names to the GObject properties of a class
+
+    Each field name is converted once, after that decoding a field is a
+    dict lookup giving its pspec, attribute name and type coercer.
+    """
+    def __init__(self, cls, setters=None):
+        """
+        :param setters: Property names mapped to the names of methods that set
+            them, used for values that are not plain types such as lists
+        """
+        setters = setters or {}
+        self.attributes = {}  # pspec name -> attribute name
+        self._pspecs = {}
+        self._fields = {}  # transmission name -> Field or None if cls lacks it
+
+        for pspec in cls.list_properties():
+            self.attributes[pspec.name] = pspec.name.replace('-', '_')
+            self._pspecs[pspec.name] = pspec
+        self._setters = setters
+
+    def get(self, key: str):
+        """Returns the Field for a transmission field name or None"""
+        try:
+            return self._fields[key]
+        except KeyError:
+            pass
+
+        name = propertify_name(key)
+        pspec = self._pspecs.get(name)
+        if pspec is None:
+            field = None
+        else:
+            field = Field(pspec, self.attributes[name],
+                          _COERCERS.get(pspec.value_type, _identity),
+                          self._setters.get(name))
+        self._fields[key] = field
+        return field
+
+    def to_kwargs(self, response) -> dict:
+        """Converts a response into keyword arguments for the constructor, skipping setters"""
+        kwargs = {}
+        for key, value in response.items():
+            field = self.get(key)
+            if field is not None and field.setter is None:
+                kwargs[field.attribute] = field.coerce(value)
+        return kwargs
+
+    def update(self, obj: GObject.Object, response):
+        """Sets the attributes of obj from response, notifying the ones that changed"""
+        for key, value in response.items():
+            field = self.get(key)
+            if field is None:
+                continue
+            if field.setter is not None:
+                getattr(obj, field.setter)(value)
+                continue
+            value = field.coerce(value)
+            if getattr(obj, field.attribute) != value:
+                setattr(obj, field.attribute, value)
+                obj.notify(field.pspec.name)
+
+
+def _identity(value):
+    return value
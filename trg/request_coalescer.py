@@ -0,0 +1,126 @@
+# request_coalescer.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib
+
+from . import rpc_trace
+
+
+class RequestCoalescer:
+    """
+    Merges read-only requests that are made close together
+
+    torrent-get calls made within WINDOW milliseconds of each other are sent as
+    one request for the union of their ids and fields, each caller then gets the
+    torrents it asked for. Callers of session-get while one is in flight share
+    its response.
+    """
+    WINDOW = 50
+
+    def __init__(self, send):
+        """
+        :param send: Function taking (method, arguments, callback, done) that makes a request
+        """
+        self._send = send
+        self._pending_gets = []
+        self._flush_id = 0
+        self._session_callbacks = None
+
+    def cancel(self):
+        """Drops requests that were not sent yet"""
+        if self._flush_id:
+            GLib.source_remove(self._flush_id)
+            self._flush_id = 0
+        self._pending_gets = []
+
+    def session_get(self, callback=None):
+        if self._session_callbacks is not None:
+            rpc_trace.logger.debug('Sharing in flight session-get')
+            self._session_callbacks.append(callback)
+            return
+
+        callbacks = self._session_callbacks = [callback]
+
+        def on_response(response):
+            for callback in callbacks:
+                if callback:
+                    callback(response)
+
+        def on_done():
+            if self._session_callbacks is callbacks:
+                self._session_callbacks = None
+
+        self._send('session-get', None, on_response, on_done)
+
+    @staticmethod
+    def _normalize_ids(ids):
+        """Returns a dict with the ids and hash strings as keys in request order or None for all torrents"""
+        if ids is None:
+            return None
+        if not isinstance(ids, (list, tuple, set)):
+            ids = (ids,)
+        # Torrent objects are turned into their ids, hash strings compare in lower case
+        ids = (getattr(torrent, 'id', torrent) for torrent in ids)
+        return dict.fromkeys(i.lower() if isinstance(i, str) else i for i in ids)
+
+    def torrent_get(self, ids, fields, callback=None):
+        """
+        :param ids: Torrent, id, hash string, list of those or None for all torrents
+        """
+        self._pending_gets.append((self._normalize_ids(ids), fields, callback))
+        if not self._flush_id:
+            self._flush_id = GLib.timeout_add(self.WINDOW, self._flush_gets)
+
+    def _flush_gets(self):
+        self._flush_id = 0
+        pending = self._pending_gets
+        self._pending_gets = []
+
+        if any(ids is None for ids, _fields, _callback in pending):
+            all_ids = None
+        else:
+            # Not sorted, ids and hash strings can be mixed
+            all_ids = list(dict.fromkeys(i for ids, _fields, _callback in pending for i in ids))
+        # id and, if asked for by hash, hashString are always needed to hand the torrents back out
+        needed_fields = ['id']
+        if all_ids is not None and any(isinstance(i, str) for i in all_ids):
+            needed_fields.append('hashString')
+        all_fields = list(dict.fromkeys(needed_fields + [field for _ids, fields, _callback in pending
+                                                         for field in fields]))
+
+        if len(pending) > 1:
+            rpc_trace.logger.debug('Coalesced %d torrent-get requests', len(pending))
+
+        def on_response(response):
+            arguments = response['arguments']
+            torrents = arguments['torrents']
+            for ids, _fields, callback in pending:
+                if not callback:
+                    continue
+                if ids is None or len(pending) == 1:
+                    selected = torrents
+                else:
+                    selected = [t for t in torrents
+                                if t['id'] in ids or t.get('hashString', '').lower() in ids]
+                caller_arguments = dict(arguments, torrents=selected)
+                callback(dict(response, arguments=caller_arguments))
+
+        arguments = {'fields': all_fields}
+        if all_ids is not None:
+            arguments['ids'] = all_ids
+        self._send('torrent-get', arguments, on_response, None)
+        return GLib.SOURCE_REMOVE
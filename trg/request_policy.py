@@ -0,0 +1,140 @@
+# request_policy.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+import logging
+from gi.repository import GLib, GObject, Soup
+
+# Reading these twice has no side effects
+_IDEMPOTENT_METHODS = {'torrent-get', 'session-get', 'session-stats', 'free-space', 'port-test'}
+
+# The request never reached the server so any method can be sent again
+_UNSENT_STATUSES = {Soup.Status.CANT_RESOLVE, Soup.Status.CANT_CONNECT}
+
+# A proxy in front of the daemon could not reach it
+_GATEWAY_STATUSES = {Soup.Status.BAD_GATEWAY, Soup.Status.SERVICE_UNAVAILABLE,
+                     Soup.Status.GATEWAY_TIMEOUT}
+
+
+# Failures of the connection itself, others such as TLS errors or redirect loops are configuration problems
+_TRANSPORT_STATUSES = {Soup.Status.CANT_RESOLVE, Soup.Status.CANT_CONNECT, Soup.Status.IO_ERROR}
+
+
+def is_transient(status_code: int) -> bool:
+    """Returns if a request failed in a way that may go away on its own"""
+    return status_code in _TRANSPORT_STATUSES or status_code in _GATEWAY_STATUSES
+
+
+class RequestPolicy(GObject.Object):
+    """Decides how long requests may take and which failures are retried"""
+    timeout = GObject.Property(type=GObject.TYPE_UINT, minimum=1, default=30)  # Seconds without data
+    max_retries = GObject.Property(type=GObject.TYPE_UINT, default=3)
+    backoff_base = GObject.Property(type=float, minimum=0.0, default=0.5)  # Seconds
+    backoff_max = GObject.Property(type=float, minimum=0.0, default=30.0)
+
+    def retry_delay(self, method: str, status_code: int, attempt: int):
+        """
+        Returns seconds to wait before sending a failed request again or None to give up
+
+        :param attempt: Number of times the request was already retried
+        """
+        if not is_transient(status_code) or attempt >= self.max_retries:
+            return None
+        if method not in _IDEMPOTENT_METHODS and status_code not in _UNSENT_STATUSES:
+            return None
+        # Full jitter so clients that failed together don't retry together
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+
+class CircuitState:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker(GObject.Object):
+    """
+    Stops requests to a server that keeps failing
+
+    After failure-threshold transient failures in a row the circuit opens and
+    requests are refused. Once the cooldown passes the probe signal is emitted
+    and only probe requests are let through, if one succeeds the circuit closes
+    otherwise it opens again with a longer cooldown.
+    """
+    __gsignals__ = {
+        'probe': (GObject.SignalFlags.RUN_FIRST, None, ()),
+    }
+
+    failure_threshold = GObject.Property(type=GObject.TYPE_UINT, minimum=1, default=5)
+    cooldown = GObject.Property(type=GObject.TYPE_UINT, minimum=1, default=5)  # Seconds
+    max_cooldown = GObject.Property(type=GObject.TYPE_UINT, minimum=1, default=300)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._current_cooldown = self.cooldown
+        self._probe_id = 0
+
+    @GObject.Property(type=str, flags=GObject.ParamFlags.READABLE)
+    def state(self):
+        return self._state
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            logging.info('Circuit {}'.format(state))
+            self._state = state
+            self.notify('state')
+
+    def allow_request(self, probe=False) -> bool:
+        if self._state == CircuitState.CLOSED:
+            return True
+        return probe and self._state == CircuitState.HALF_OPEN
+
+    def record_success(self):
+        self._failures = 0
+        self._current_cooldown = self.cooldown
+        self._set_state(CircuitState.CLOSED)
+
+    def record_failure(self):
+        self._failures += 1
+        if self._state == CircuitState.HALF_OPEN:
+            self._current_cooldown = min(self._current_cooldown * 2, self.max_cooldown)
+            self._open()
+        elif self._state == CircuitState.CLOSED and self._failures >= self.failure_threshold:
+            self._open()
+
+    def reset(self):
+        """Closes the circuit, for when the reason for failures is known to be gone"""
+        if self._probe_id:
+            GLib.source_remove(self._probe_id)
+            self._probe_id = 0
+        self.record_success()
+
+    def _open(self):
+        if self._probe_id:
+            GLib.source_remove(self._probe_id)
+        logging.debug('Probing again in {}s'.format(self._current_cooldown))
+        self._probe_id = GLib.timeout_add_seconds(self._current_cooldown, self._on_cooldown_finished)
+        self._set_state(CircuitState.OPEN)
+
+    def _on_cooldown_finished(self):
+        self._probe_id = 0
+        self._set_state(CircuitState.HALF_OPEN)
+        self.emit('probe')
+        return GLib.SOURCE_REMOVE
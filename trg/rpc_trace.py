@@ -0,0 +1,76 @@
+# rpc_trace.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tracing of RPC payloads.
+
+Payloads are only formatted when a trace would actually be written, the
+regular log gets a truncated copy while the optional file sink gets all of it.
+"""
+
+import os
+import logging
+import logging.handlers
+
+logger = logging.getLogger('trg.rpc')
+
+_file_logger = logging.getLogger('trg.rpc.file')
+_file_logger.propagate = False
+_file_logger.setLevel(logging.DEBUG)
+_file_handler = None
+
+DEFAULT_LIMIT = 2048
+_limit = DEFAULT_LIMIT
+
+
+def set_limit(limit: int):
+    """Sets how many bytes of each payload are written to the log, 0 for no limit"""
+    global _limit
+    _limit = max(limit, 0)
+
+
+def enable_file_sink(path: str, max_bytes: int=10 * 1024 * 1024, backup_count: int=3):
+    """Writes full, untruncated traces to a rotating file at path"""
+    global _file_handler
+    if _file_handler is not None:
+        _file_logger.removeHandler(_file_handler)
+        _file_handler.close()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes,
+                                                         backupCount=backup_count, encoding='UTF-8')
+    _file_handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    _file_logger.addHandler(_file_handler)
+    logger.info('Writing RPC traces to {}'.format(path))
+
+
+def trace(direction: str, data: bytes):
+    """
+    Traces a raw payload
+
+    :param direction: '>>>' for requests and '<<<' for responses
+    """
+    if _file_handler is not None:
+        _file_logger.debug('{} ({} bytes)\n{}'.format(direction, len(data), data.decode('UTF-8', 'replace')))
+
+    if logger.isEnabledFor(logging.DEBUG):
+        if _limit and len(data) > _limit:
+            text = '{}… ({} bytes truncated)'.format(
+                data[:_limit].decode('UTF-8', 'replace'), len(data) - _limit)
+        else:
+            text = data.decode('UTF-8', 'replace')
+        logger.debug('{} ({} bytes)\n{}'.format(direction, len(data), text))
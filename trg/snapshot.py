@@ -0,0 +1,87 @@
+# snapshot.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+On disk copy of the last known torrent list of a server.
+
+It is stored like a table format torrent-get response, the field names
+followed by one list of values per torrent, so loading it goes through
+the same code as a live response.
+"""
+
+import os
+import re
+import json
+import logging
+
+from gi.repository import GLib
+
+from .json_stream import TableDecoder
+from .list_model_override import ListStore
+
+VERSION = 1
+
+_TRACKER_FIELDS = ('announce', 'scrape', 'id', 'tier')
+
+
+def get_path(hostname: str, port: int) -> str:
+    name = '{}-{}.json'.format(re.sub(r'[^\w.-]', '_', hostname), port)
+    return os.path.join(GLib.get_user_cache_dir(), 'trg', 'snapshots', name)
+
+
+def load(path: str) -> list:
+    """Returns the torrents in a snapshot as read-only mappings, empty if there is none"""
+    try:
+        with open(path, encoding='UTF-8') as f:
+            data = json.load(f)
+        if data.get('version') != VERSION:
+            logging.info('Ignoring snapshot with version {}'.format(data.get('version')))
+            return []
+        return TableDecoder().decode(data['torrents'])
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        logging.warning('Failed to load snapshot {}: {}'.format(path, e))
+        return []
+
+
+def save(path: str, torrents, fields: list, codec):
+    """
+    Writes the given fields of every torrent to path
+
+    :param codec: PropertyCodec of Torrent, used to find the attribute of each field
+    """
+    attributes = [codec.get(field).attribute for field in fields]
+    rows = [fields]
+    for torrent in torrents:
+        row = []
+        for attribute in attributes:
+            value = getattr(torrent, attribute)
+            if attribute == 'trackers':
+                value = [{key: getattr(tracker, key) for key in _TRACKER_FIELDS}
+                         for tracker in ListStore(value)]
+            row.append(value)
+        rows.append(row)
+
+    data = json.dumps({'version': VERSION, 'torrents': rows}, separators=(',', ':'))
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        GLib.file_set_contents(path, data.encode('UTF-8'))
+    except (OSError, GLib.Error) as e:
+        logging.warning('Failed to save snapshot {}: {}'.format(path, e))
+        return
+    logging.debug('Saved {} torrents to {}'.format(len(rows) - 1, path))
@@ -0,0 +1,97 @@
+# startup_profile.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Timing of startup for --profile-startup.
+
+Milestones are recorded with mark() and work spread over many places, such
+as registering templates, with measure(). Everything is a no-op until
+enable() is called so the calls can stay in place.
+"""
+
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+_start = None
+_marks = OrderedDict()  # Name -> seconds since start
+_totals = OrderedDict()  # Name -> seconds spent
+_waiting = None
+_reported = False
+
+
+def enable(start: float=None):
+    """
+    :param start: time.perf_counter() value to count from, defaults to now
+    """
+    global _start
+    _start = time.perf_counter() if start is None else start
+
+
+def is_enabled() -> bool:
+    return _start is not None
+
+
+def mark(name: str):
+    """Records that a milestone was reached, only the first time counts"""
+    if _start is None or name in _marks:
+        return
+    _marks[name] = time.perf_counter() - _start
+    if _waiting is not None:
+        _waiting.discard(name)
+        if not _waiting:
+            report()
+
+
+@contextmanager
+def measure(name: str):
+    """Adds the time spent in the block to the total for name"""
+    if _start is None:
+        yield
+        return
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        _totals[name] = _totals.get(name, 0.0) + time.perf_counter() - begin
+
+
+def report_after(*names):
+    """Prints the report once all of the named milestones are reached"""
+    global _waiting
+    if _start is None:
+        return
+    _waiting = set(names).difference(_marks)
+    if not _waiting:
+        report()
+
+
+def report():
+    global _reported
+    if _start is None or _reported:
+        return
+    _reported = True
+
+    lines = ['Startup profile:']
+    previous = 0.0
+    for name, elapsed in _marks.items():
+        lines.append('  {:9.1f} ms  (+{:.1f} ms)  {}'.format(elapsed * 1000, (elapsed - previous) * 1000, name))
+        previous = elapsed
+    for name, spent in _totals.items():
+        lines.append('  {:9.1f} ms  total in {}'.format(spent * 1000, name))
+    print('\n'.join(lines), file=sys.stderr)
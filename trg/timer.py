@@ -15,13 +15,22 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import random
 import logging
 from gi.repository import GLib, GObject
 
 
 class Timer(GObject.Object):
-    """Dynamic timer that allows dynamically changing frequency"""
-    timeout = GObject.Property(type=GObject.TYPE_UINT)
+    """
+    Adaptive timer
+
+    Runs every timeout seconds while report_activity() says there was something
+    going on and backs off exponentially up to max-timeout while there wasn't.
+    Without any reports it behaves like a fixed interval timer.
+    """
+    timeout = GObject.Property(type=GObject.TYPE_UINT, minimum=1, default=1)  # Seconds
+    max_timeout = GObject.Property(type=GObject.TYPE_UINT, minimum=1, default=300)
+    jitter = GObject.Property(type=float, minimum=0.0, maximum=1.0, default=0.1)  # Fraction of interval
 
     def __init__(self, function, **kwargs):
         super().__init__(**kwargs)
@@ -30,6 +39,8 @@ class Timer(GObject.Object):
         self._paused = False
         self._func = function
         self._id = 0
+        self._interval = float(self.timeout)
+        self._decision = 'start'
 
         self._add_timeout()
         self.connect('notify::timeout', self._on_timeout_changed)
@@ -40,15 +51,46 @@ class Timer(GObject.Object):
         if self._id:
             GLib.source_remove(self._id)
 
+    @GObject.Property(type=float, flags=GObject.ParamFlags.READABLE)
+    def interval(self):
+        """Current interval in seconds"""
+        return self._interval
+
+    @GObject.Property(type=str, flags=GObject.ParamFlags.READABLE)
+    def decision(self):
+        """Why the current interval was chosen"""
+        return self._decision
+
+    def _set_interval(self, interval: float, decision: str):
+        interval = min(max(interval, self.timeout), max(self.max_timeout, self.timeout))
+        changed = interval != self._interval
+        self._interval = interval
+        self._decision = decision
+        if changed:
+            logging.debug('Timer interval set to {:.1f}s ({})'.format(interval, decision))
+            self.notify('interval')
+        self.notify('decision')
+        return changed
+
     def _add_timeout(self):
         if self._id:
             GLib.source_remove(self._id)
-        self._id = GLib.timeout_add_seconds(self.timeout, self._run_func)
+        spread = self._interval * self.jitter
+        delay = self._interval + random.uniform(-spread, spread)
+        self._id = GLib.timeout_add(int(delay * 1000), self._on_timeout)
 
     def _on_timeout_changed(self, prop, param):
         logging.debug('Timeout changed')
+        self._set_interval(self.timeout, 'timeout-changed')
         self._add_timeout()
 
+    def _on_timeout(self):
+        self._id = 0
+        self._run_func()
+        if not self._id:
+            self._add_timeout()
+        return GLib.SOURCE_REMOVE
+
     def _run_func(self):
         if not self._paused:
             try:
@@ -57,7 +99,14 @@ class Timer(GObject.Object):
             except Exception as e:
                 logging.exception(e)
 
-        return GLib.SOURCE_CONTINUE
+    def report_activity(self, active: bool):
+        """Report whether the last run found anything going on"""
+        if active:
+            if self._set_interval(self.timeout, 'active'):
+                self._add_timeout()
+        else:
+            # Takes effect from the next run on
+            self._set_interval(self._interval * 2, 'idle')
 
     def pause(self):
         self._paused = True
@@ -67,14 +116,17 @@ class Timer(GObject.Object):
 
     def run_once(self):
         # To be the most efficient we will restart the timer from here
-        GLib.source_remove(self._id)
+        if self._id:
+            GLib.source_remove(self._id)
         self._id = 0
+        self._set_interval(self.timeout, 'user-action')
 
         def run_real():
+            self._id = 0
             self._run_func()
             self._add_timeout()
             return GLib.SOURCE_REMOVE
 
         # FIXME: The timing of this is wrong but logically all of our HTTP calls are in the correct order
         # the server just doesn't respond with the up to date information for some actions
-        GLib.timeout_add(250, run_real)
+        self._id = GLib.timeout_add(250, run_real)
@@ -15,8 +15,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import logging
 from enum import IntEnum
+from urllib.parse import urlparse
 import os
 
 from gi.repository import (
@@ -26,6 +26,7 @@ from gi.repository import (
 )
 
 from .tracker import Tracker
+from .property_codec import PropertyCodec
 
 
 class TorrentFile(GObject.Object):
@@ -71,7 +72,7 @@ class Torrent(GObject.Object):
         ),
         'files': (
             Gio.ListModel, _('Files'), _('List of files'),
-            GObject.ParamFlags.CONSTRUCT|GObject.ParamFlags.READWRITE,
+            GObject.ParamFlags.READWRITE,
         ),
         'size-when-done': (
             GObject.TYPE_UINT64, _('Size when done'), _('Total size when finished'),
@@ -114,14 +115,27 @@ class Torrent(GObject.Object):
         ),
         'trackers': (
             Gio.ListModel, _('Trackers'), _('List of trackers'),
+            GObject.ParamFlags.READWRITE,
+        ),
+        'hash-string': (
+            str, _('Hash'), _('Info hash of torrent'), '',
+            GObject.ParamFlags.CONSTRUCT|GObject.ParamFlags.READWRITE,
+        ),
+        'stale': (
+            bool, _('Stale'), _('Loaded from a snapshot and not yet updated by the server'), False,
             GObject.ParamFlags.CONSTRUCT|GObject.ParamFlags.READWRITE,
         ),
     }
 
+    # Most torrents never get files and only some have trackers so the
+    # stores are created on first use, until then the shared empty ones are used
+    _files = None
+    _trackers = None
+    # Hostnames of the announce URLs of trackers, replaced whenever they change
+    tracker_hosts = frozenset()
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.files = Gio.ListStore.new(TorrentFile)
-        self.trackers = Gio.ListStore.new(Tracker)
 
     def __str__(self):
         return self.name
@@ -129,42 +143,32 @@ class Torrent(GObject.Object):
     def __repr__(self):
         return '<Torrent {}>'.format(self.id)
 
-    @staticmethod
-    def _propertify_name(name: str) -> str:
-        """Converts a transmission property name to a gobject style one"""
-        prop_name = ''
-        for c in name:
-            if c.isupper():
-                prop_name += '-'
-                prop_name += c.lower()
-            else:
-                prop_name += c
-        return prop_name
-
-    @staticmethod
-    def _propertify_dict(d: dict) -> dict:
-        prop_dict = {}
-        for k, v in d.items():
-            prop_dict[Torrent._propertify_name(k)] = v
-        return prop_dict
+    @property
+    def files(self) -> Gio.ListModel:
+        return self._files if self._files is not None else _NO_FILES
+
+    @files.setter
+    def files(self, value: Gio.ListModel):
+        self._files = value
+
+    @property
+    def trackers(self) -> Gio.ListModel:
+        return self._trackers if self._trackers is not None else _NO_TRACKERS
+
+    @trackers.setter
+    def trackers(self, value: Gio.ListModel):
+        self._trackers = value
 
     def update_from_response(self, response: dict):
-        for k, v in response.items():
-            if k != 'id':
-                prop = self._propertify_name(k)
-                if getattr(self.props, prop) != v:
-                    logging.debug('Updating {} of torrent {}'.format(k, self))
-                    setattr(self.props, prop, v)
+        self._codec.update(self, response)
 
     @classmethod
     def new_from_response(cls, response: dict):
-        # TODO: Generic solution to lists
-        files = response.pop('files', None)
-        trackers = response.pop('trackers', None)
-        prop_dict = Torrent._propertify_dict(response)
-        torrent = cls(**prop_dict)
+        torrent = cls(**cls._codec.to_kwargs(response))
+        files = response.get('files')
         if files:
             torrent.set_files(files)
+        trackers = response.get('trackers')
         if trackers:
             torrent._set_trackers(trackers)
         return torrent
@@ -179,25 +183,47 @@ class Torrent(GObject.Object):
             path = os.path.join(self.download_dir, self.name)
         return Gio.File.new_for_path(path).get_uri()
 
+    def _replace_items(self, name: str, item_type, items: list) -> bool:
+        """Returns True if notify was emitted for name"""
+        store = getattr(self, '_' + name)
+        if store is not None:
+            store.splice(0, store.get_n_items(), items)
+        elif items:
+            store = Gio.ListStore.new(item_type)
+            store.splice(0, 0, items)
+            setattr(self, '_' + name, store)
+            # Anything holding the shared empty store needs to get the new one
+            self.notify(name)
+            return True
+        return False
+
     def set_files(self, files: list):
-        self.files.remove_all()
-        for d in files:
-            prop_dict = self._propertify_dict(d)
-            f = TorrentFile(**prop_dict)
-            self.files.append(f)
+        to_kwargs = _file_codec.to_kwargs
+        self._replace_items('files', TorrentFile, [TorrentFile(**to_kwargs(d)) for d in files])
 
     def _set_trackers(self, trackers: list):
-        self.trackers.remove_all()
-        for d in trackers:
-            prop_dict = self._propertify_dict(d)
-            t = Tracker(**prop_dict)
-            self.trackers.append(t)
+        to_kwargs = _tracker_codec.to_kwargs
+        items = [Tracker(**to_kwargs(d)) for d in trackers]
+        hosts = frozenset(urlparse(tracker.announce).hostname for tracker in items) - {None}
+        hosts_changed = hosts != self.tracker_hosts
+        self.tracker_hosts = hosts
+        if not self._replace_items('trackers', Tracker, items) and hosts_changed:
+            self.notify('trackers')
 
     def do_get_property(self, prop):
-        return getattr(self, prop.name.replace('-', '_'))
+        return getattr(self, self._codec.attributes[prop.name])
 
     def do_set_property(self, prop, value):
-        setattr(self, prop.name.replace('-', '_'), value)
+        setattr(self, self._codec.attributes[prop.name], value)
+
+
+# Never modified, see Torrent._replace_items()
+_NO_FILES = Gio.ListStore.new(TorrentFile)
+_NO_TRACKERS = Gio.ListStore.new(Tracker)
+
+Torrent._codec = PropertyCodec(Torrent, setters={'files': 'set_files', 'trackers': '_set_trackers'})
+_file_codec = PropertyCodec(TorrentFile)
+_tracker_codec = PropertyCodec(Tracker)
 
 
 class TorrentStatus(IntEnum):
@@ -0,0 +1,104 @@
+# torrent_facets.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import Gio
+
+from .utils import normalize_directory
+
+
+class Facet:
+    """Counts how many torrents have each value"""
+    def __init__(self):
+        self._counts = {}
+
+    def add(self, value):
+        self._counts[value] = self._counts.get(value, 0) + 1
+
+    def remove(self, value):
+        count = self._counts[value] - 1
+        if count:
+            self._counts[value] = count
+        else:
+            del self._counts[value]
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, value) -> bool:
+        return value in self._counts
+
+    def count(self, value) -> int:
+        return self._counts.get(value, 0)
+
+    def values(self) -> list:
+        return sorted(self._counts)
+
+    def items(self) -> list:
+        """Returns (value, count) pairs sorted by value"""
+        return sorted(self._counts.items())
+
+
+class TorrentFacets:
+    """
+    Keeps the tracker hostnames and download directories of a Gio.ListStore
+    of torrents counted as torrents are added, removed or changed.
+    """
+    def __init__(self, store: Gio.ListStore):
+        self.trackers = Facet()
+        self.directories = Facet()  # Without trailing slashes
+        self._items = []  # Mirrors the order of the store
+        self._entries = {}  # Torrent -> [notify handler, directory, tracker hosts]
+
+        store.connect('items-changed', self._on_items_changed)
+        self._on_items_changed(store, 0, 0, store.get_n_items())
+
+    def _on_items_changed(self, store, position, removed, added):
+        for torrent in self._items[position:position + removed]:
+            handler_id, directory, hosts = self._entries.pop(torrent)
+            torrent.disconnect(handler_id)
+            self.directories.remove(directory)
+            for host in hosts:
+                self.trackers.remove(host)
+
+        new_items = [store.get_item(position + i) for i in range(added)]
+        self._items[position:position + removed] = new_items
+        for torrent in new_items:
+            directory = normalize_directory(torrent.download_dir)
+            hosts = torrent.tracker_hosts
+            self.directories.add(directory)
+            for host in hosts:
+                self.trackers.add(host)
+            handler_id = torrent.connect('notify', self._on_torrent_notify)
+            self._entries[torrent] = [handler_id, directory, hosts]
+
+    def _on_torrent_notify(self, torrent, paramspec):
+        name = paramspec.name
+        if name == 'download-dir':
+            entry = self._entries[torrent]
+            directory = normalize_directory(torrent.download_dir)
+            if directory != entry[1]:
+                self.directories.remove(entry[1])
+                self.directories.add(directory)
+                entry[1] = directory
+        elif name == 'trackers':
+            entry = self._entries[torrent]
+            hosts = torrent.tracker_hosts
+            for host in entry[2] - hosts:
+                self.trackers.remove(host)
+            for host in hosts - entry[2]:
+                self.trackers.add(host)
+            entry[2] = hosts
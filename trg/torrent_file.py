@@ -94,17 +94,18 @@ class TorrentFile(GObject.Object):
     def _parse_data(self, data: bytes):
         """Converts the dictionary of metadata into a tree of files"""
         try:
-            data_dict = bencode.decode(data)
+            # Only names and lengths are shown so the piece hashes are not needed
+            data_dict = bencode.decode(data, skip_keys={b'pieces'})
             info = data_dict[b'info']
             if b'files' in info:
-                directory = info[b'name'].decode('UTF-8')
+                directory = str(info[b'name'], 'UTF-8')
                 self.files = TorrentFileNode(directory)
                 files = info[b'files']
                 for i, d in enumerate(files):
-                    utf8_paths = [path.decode('UTF-8') for path in d[b'path']]
+                    utf8_paths = [str(path, 'UTF-8') for path in d[b'path']]
                     self.files.add_file(utf8_paths, d[b'length'], i)
             else:
-                filename = info[b'name'].decode('UTF-8')
+                filename = str(info[b'name'], 'UTF-8')
                 self.files = TorrentFileNode(filename, info[b'length'], index=0)
 
             self.emit('file-loaded')
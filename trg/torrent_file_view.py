@@ -104,6 +104,7 @@ class TorrentFileView(Gtk.TreeView):
                                                          node.index, False])
         for child in node.children:
             self._add_node_to_store(parent, child)
+        return parent
 
     def set_torrent_file(self, torrent):
         self.torrent_file_store.clear()
@@ -0,0 +1,244 @@
+# torrent_filter.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+from gi.repository import GLib, Gio
+
+from .utils import normalize_directory
+
+
+class FilterKeys:
+    """The values of a torrent the filters compare against, kept in the form they need"""
+    __slots__ = ('name', 'directory', 'trackers', 'status', 'error', 'notify_id')
+
+    def __init__(self, torrent):
+        self.name = torrent.name.lower()
+        self.directory = normalize_directory(torrent.download_dir)
+        self.status = torrent.status
+        self.error = torrent.error
+        self.trackers = torrent.tracker_hosts
+        self.notify_id = 0
+
+
+class TorrentFilter:
+    """
+    Decides which torrents of a Gio.ListStore are shown.
+
+    Every torrent gets its FilterKeys once and they are updated as its
+    properties change, so matches() only compares precomputed values
+    against the active criteria. When such a change shows or hides a
+    torrent its row in the model given to set_model() gets row-changed.
+    """
+
+    # Longest a single main loop iteration spends in refilter()
+    SLICE_SECONDS = 0.005
+
+    def __init__(self, store: Gio.ListStore):
+        self._items = []  # Mirrors the order of the store
+        self._keys = {}  # Torrent -> FilterKeys
+        self._visible = set()  # Torrents matches() last accepted
+        self._predicates = ()
+        self._narrowed = True  # Every change since the last refilter() only hid torrents
+        self._pending = None
+        self._refilter_id = 0
+        self._model = None
+
+        self.text = None
+        self.status = None
+        self.error = None
+        self.tracker = None
+        self.directory = None
+
+        self._store = store
+        self._store_id = store.connect('items-changed', self._on_items_changed)
+        self._on_items_changed(store, 0, 0, store.get_n_items())
+
+    def destroy(self):
+        """Disconnects from the store and its torrents, the filter is not usable afterwards"""
+        if self._refilter_id:
+            GLib.source_remove(self._refilter_id)
+            self._refilter_id = 0
+        self._pending = None
+        self._model = None
+        if self._store_id:
+            self._store.disconnect(self._store_id)
+            self._store_id = 0
+        for torrent, keys in self._keys.items():
+            torrent.disconnect(keys.notify_id)
+        self._keys = {}
+        self._items = []
+        self._visible = set()
+
+    def set_model(self, model):
+        """
+        :param model: ListTreeModel of the same store that the view filters with matches()
+        """
+        self._model = model
+
+    def set_criteria(self, **criteria) -> bool:
+        """
+        Changes any of text, status, error, tracker and directory, None disables one
+
+        :returns: True if anything changed and the list has to be filtered again
+        """
+        changed = False
+        for name, value in criteria.items():
+            if name == 'text' and value is not None:
+                value = value.lower()
+            elif name == 'directory' and value is not None:
+                value = normalize_directory(value)
+            old_value = getattr(self, name)
+            if old_value != value:
+                setattr(self, name, value)
+                changed = True
+                self._narrowed = self._narrowed and self._narrows(name, old_value, value)
+
+        if changed:
+            self._predicates = self._build_predicates()
+        return changed
+
+    @staticmethod
+    def _narrows(name: str, old_value, value) -> bool:
+        """If every torrent rejected with old_value is also rejected with value"""
+        if old_value is None:
+            return True
+        # A longer search can only match fewer names
+        return name == 'text' and value is not None and old_value in value
+
+    def _build_predicates(self) -> tuple:
+        # Cheapest comparisons first, the substring search last
+        predicates = []
+        if self.status is not None:
+            status = self.status
+            predicates.append(lambda keys: keys.status == status)
+        if self.error is not None:
+            error = self.error
+            predicates.append(lambda keys: keys.error == error)
+        if self.directory is not None:
+            directory = self.directory
+            predicates.append(lambda keys: keys.directory == directory)
+        if self.tracker is not None:
+            tracker = self.tracker
+            predicates.append(lambda keys: tracker in keys.trackers)
+        if self.text is not None:
+            text = self.text
+            predicates.append(lambda keys: text in keys.name)
+        return tuple(predicates)
+
+    def matches(self, torrent) -> bool:
+        keys = self._keys.get(torrent)
+        if keys is None:
+            if not self._store_id:
+                return False  # Destroyed
+            # A view may ask before our own items-changed handler ran
+            keys = self._track(torrent)
+        if self._test(keys):
+            self._visible.add(torrent)
+            return True
+        self._visible.discard(torrent)
+        return False
+
+    def _test(self, keys: FilterKeys) -> bool:
+        for predicate in self._predicates:
+            if not predicate(keys):
+                return False
+        return True
+
+    def refilter(self):
+        """
+        Applies changed criteria to the rows of the model over the next main loop iterations
+
+        Only rows that have to appear or disappear get row-changed, which
+        makes a Gtk.TreeModelFilter on top of the model ask matches() again.
+        If the criteria only narrowed since the last call the hidden rows
+        are not even looked at.
+        """
+        if self._model is None:
+            return
+        if self._narrowed and self._pending is None:
+            candidates = list(self._visible)
+        else:
+            # A refilter still in progress may not have shown every row it should
+            candidates = list(self._items)
+        self._narrowed = True
+        self._pending = iter(candidates)
+        if not self._refilter_id:
+            self._refilter_id = GLib.idle_add(self._refilter_slice)
+
+    def _refilter_slice(self):
+        deadline = time.perf_counter() + self.SLICE_SECONDS
+        keys_map = self._keys
+        visible = self._visible
+        model = self._model
+        for torrent in self._pending:
+            keys = keys_map.get(torrent)
+            if keys is None:
+                continue  # Removed since
+            if self._test(keys) != (torrent in visible):
+                model.item_changed(torrent)
+            if time.perf_counter() >= deadline:
+                return GLib.SOURCE_CONTINUE
+
+        self._pending = None
+        self._refilter_id = 0
+        return GLib.SOURCE_REMOVE
+
+    def _on_items_changed(self, store, position, removed, added):
+        for torrent in self._items[position:position + removed]:
+            self._untrack(torrent)
+
+        new_items = [store.get_item(position + i) for i in range(added)]
+        self._items[position:position + removed] = new_items
+        for torrent in new_items:
+            if torrent not in self._keys:
+                self._track(torrent)
+
+    def _track(self, torrent) -> FilterKeys:
+        keys = FilterKeys(torrent)
+        self._keys[torrent] = keys
+        keys.notify_id = torrent.connect('notify', self._on_torrent_notify)
+        return keys
+
+    def _untrack(self, torrent):
+        keys = self._keys.pop(torrent, None)
+        if keys is None:
+            return
+        self._visible.discard(torrent)
+        torrent.disconnect(keys.notify_id)
+
+    def _on_torrent_notify(self, torrent, paramspec):
+        name = paramspec.name
+        keys = self._keys[torrent]
+        if name == 'name':
+            keys.name = torrent.name.lower()
+        elif name == 'download-dir':
+            keys.directory = normalize_directory(torrent.download_dir)
+        elif name == 'status':
+            keys.status = torrent.status
+        elif name == 'error':
+            keys.error = torrent.error
+        elif name == 'trackers':
+            keys.trackers = torrent.tracker_hosts
+        else:
+            return
+
+        # Not every key is a column of the model, so nothing else makes the
+        # view ask matches() again when one of those changes
+        if self._predicates and self._model is not None:
+            if self._test(keys) != (torrent in self._visible):
+                self._model.item_changed(torrent)
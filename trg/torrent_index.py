@@ -0,0 +1,106 @@
+# torrent_index.py
+#
+# Copyright (C) 2016 Patrick Griffis <tingping@tingping.se>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import Gio
+
+
+class TorrentIndex:
+    """
+    Keeps an id -> (Torrent, position) mapping of a Gio.ListStore up to date.
+
+    Positions are renumbered lazily so that removing many torrents only costs
+    one pass over the tail of the list once the next lookup happens.
+
+    If an add and a refresh race the store can hold two torrents with the
+    same id. Both stay indexed so the index never disagrees with the store,
+    lookups return the one added last and remove() drops every copy.
+    """
+    def __init__(self, store: Gio.ListStore):
+        self._store = store
+        self._items = []  # Mirrors the order of the store
+        self._torrents = {}  # Id -> list of Torrents in the order they were added
+        self._positions = {}  # Torrent -> position
+        self._valid = 0  # Positions below this are known to be correct
+
+        store.connect('items-changed', self._on_items_changed)
+        self._on_items_changed(store, 0, 0, store.get_n_items())
+
+    def _on_items_changed(self, store, position, removed, added):
+        for torrent in self._items[position:position + removed]:
+            torrents = self._torrents[torrent.id]
+            torrents.remove(torrent)
+            if not torrents:
+                del self._torrents[torrent.id]
+            self._positions.pop(torrent, None)
+
+        new_items = [store.get_item(position + i) for i in range(added)]
+        for torrent in new_items:
+            self._torrents.setdefault(torrent.id, []).append(torrent)
+        self._items[position:position + removed] = new_items
+
+        self._valid = min(self._valid, position)
+
+    def _renumber(self):
+        positions = self._positions
+        items = self._items
+        for i in range(self._valid, len(items)):
+            positions[items[i]] = i
+        self._valid = len(items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, torrent_id: int) -> bool:
+        return torrent_id in self._torrents
+
+    def __iter__(self):
+        return (torrent.id for torrent in self._items)
+
+    def get(self, torrent_id: int):
+        """Returns the Torrent with this id or None"""
+        torrents = self._torrents.get(torrent_id)
+        if torrents is None:
+            return None
+        return torrents[-1]
+
+    def lookup(self, torrent_id: int) -> tuple:
+        """Returns (Torrent, position) for this id or (None, -1)"""
+        torrent = self.get(torrent_id)
+        if torrent is None:
+            return None, -1
+        if self._valid < len(self._items):
+            self._renumber()
+        return torrent, self._positions[torrent]
+
+    def remove(self, torrent_ids):
+        """Removes every torrent in torrent_ids from the store, ignoring unknown ids"""
+        if self._valid < len(self._items):
+            self._renumber()
+        positions = sorted((self._positions[torrent] for torrent_id in set(torrent_ids)
+                            for torrent in self._torrents.get(torrent_id, ())), reverse=True)
+
+        # Removing from the back keeps earlier positions valid and contiguous
+        # runs are collapsed into a single splice
+        i = 0
+        while i < len(positions):
+            end = positions[i]
+            start = end
+            i += 1
+            while i < len(positions) and positions[i] == start - 1:
+                start -= 1
+                i += 1
+            self._store.splice(start, end - start + 1, [])
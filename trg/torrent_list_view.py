@@ -32,9 +32,7 @@ from gi.repository import (
 # noinspection PyUnresolvedReferences
 from . import cell_renderers # noqa: ignore=F401
 from .client import Client
-from .add_dialog import MoveDialog
-from .list_wrapper import WrappedStore
-from .torrent_properties import TorrentProperties
+from .list_tree_model import ListTreeModel
 from .utils import is_flatpak
 from .gi_composites import GtkTemplate
 
@@ -56,13 +54,26 @@ class TorrentListView(Gtk.TreeView):
         props['status'] = GObject.TYPE_UINT64
         props['download-dir'] = str
         props['error'] = GObject.TYPE_UINT64
-        store = WrappedStore.new_for_model(model, props)
+        store = ListTreeModel(model, props)
         self.filter_model = Gtk.TreeModelFilter(child_model=store)
         self._sort_model = Gtk.TreeModelSort(model=self.filter_model)
 
         super().__init__(model=self._sort_model, **kwargs)
         self.init_template()
 
+        store.connect('rebuild-started', self._on_rebuild_started)
+        store.connect('rebuild-finished', self._on_rebuild_finished)
+
+    def _on_rebuild_started(self, store):
+        # Without a view referencing them the filter and sort models
+        # can drop their caches and don't track each inserted row
+        self.set_model(None)
+        self._sort_model.clear_cache()
+        self.filter_model.clear_cache()
+
+    def _on_rebuild_finished(self, store):
+        self.set_model(self._sort_model)
+
     def do_button_press_event(self, event: Gdk.EventButton) -> int:
         if not event.triggers_context_menu():
             return Gtk.TreeView.do_button_press_event(self, event)
@@ -91,14 +102,14 @@ class TorrentListView(Gtk.TreeView):
         return Gdk.EVENT_STOP
 
     def _open_torrent_properties(self, torrents):
-        for torrent in torrents:  # TODO: Handle opening too many
-            dialog = TorrentProperties(torrent=torrent, client=self.client, transient_for=self.get_toplevel())
-            dialog.present()
+        from .torrent_properties import TorrentProperties
+        dialog = TorrentProperties(torrents=torrents, client=self.client, transient_for=self.get_toplevel())
+        dialog.present()
 
     def _move_torrents(self, torrents):
-        for torrent in torrents:  # TODO: Maybe move multiple at once?
-            dialog = MoveDialog(torrent=torrent, client=self.client, transient_for=self.get_toplevel())
-            dialog.present()
+        from .add_dialog import MoveDialog
+        dialog = MoveDialog(torrents=torrents, client=self.client, transient_for=self.get_toplevel())
+        dialog.present()
 
     def _open_torrents(self, torrents):
         for torrent in torrents:
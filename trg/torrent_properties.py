@@ -15,11 +15,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import json
+
 from gi.repository import (
     GObject,
     Gtk,
 )
-from .torrent import Torrent
 from .client import Client
 from .torrent_file_view import FileColumn
 from .torrent_file import TorrentFileNode
@@ -30,7 +31,7 @@ from .gi_composites import GtkTemplate
 class TorrentProperties(Gtk.Dialog):
     __gtype_name__ = 'TorrentProperties'
 
-    torrent = GObject.Property(type=Torrent, flags=GObject.ParamFlags.READWRITE|GObject.ParamFlags.CONSTRUCT_ONLY)
+    torrents = GObject.Property(type=object, flags=GObject.ParamFlags.READWRITE|GObject.ParamFlags.CONSTRUCT_ONLY)
     client = GObject.Property(type=Client, flags=GObject.ParamFlags.READWRITE|GObject.ParamFlags.CONSTRUCT_ONLY)
     file_view = GtkTemplate.Child()
 
@@ -38,18 +39,20 @@ class TorrentProperties(Gtk.Dialog):
         super().__init__(use_header_bar=1, **kwargs)
         self.init_template()
         self.file_view.percent_column.props.visible = True
-        self.client.torrent_get(self.torrent, ['files', 'fileStats'], callback=self._on_got_files)
-
-    def _on_got_files(self, response):
-        t = response['arguments']['torrents'][0]
+        self._roots = []  # Top level iter and id of each torrent
+        if len(self.torrents) > 1:
+            self.props.title = _('Properties of {} Torrents').format(len(self.torrents))
+        self.client.torrent_get(self.torrents, ['id', 'files', 'fileStats'], callback=self._on_got_files)
 
+    @staticmethod
+    def _build_tree(t):
         files = t['files']
         file_stats = t['fileStats']
         for i, f in enumerate(files):
             f.update(file_stats[i])
 
         if not files:
-            return
+            return None
 
         first_name = files[0]['name']
         if '/' in first_name:
@@ -61,13 +64,20 @@ class TorrentProperties(Gtk.Dialog):
                 root_node.add_file(paths, f['length'], i, f['bytesCompleted'],
                                    f['wanted'], f['priority'])
         else:
+            f = files[0]
             root_node = TorrentFileNode(f['name'], f['length'], 0, f['bytesCompleted'],
                                         f['wanted'], f['priority'])
+        return root_node
 
-        self.file_view._add_node_to_store(None, root_node)
+    def _on_got_files(self, response):
+        for t in response['arguments']['torrents']:
+            root_node = self._build_tree(t)
+            if root_node is not None:
+                root_iter = self.file_view._add_node_to_store(None, root_node)
+                self._roots.append((root_iter, t['id']))
         self.file_view.expand_all()
 
-    def _get_wanted(self):
+    def _get_wanted(self, root_iter):
         store = self.file_view.torrent_file_store
         files_wanted = []
         files_unwanted = []
@@ -75,29 +85,35 @@ class TorrentProperties(Gtk.Dialog):
         pri_norm = []
         pri_low = []
 
+        def add_file(_iter):
+            row = store[_iter]
+            index = row[FileColumn.index]
+
+            if row[FileColumn.pri_val] == -1:
+                pri_low.append(index)
+            elif row[FileColumn.pri_val] == 0:
+                pri_norm.append(index)
+            elif row[FileColumn.pri_val] == 1:
+                pri_high.append(index)
+
+            if row[FileColumn.download]:
+                files_wanted.append(index)
+            else:
+                files_unwanted.append(index)
+
         def iterate_model(_iter):
             while _iter is not None:
                 if store.iter_has_child(_iter):
                     iterate_model(store.iter_children(_iter))
                 else:
-                    row = store[_iter]
-                    index = row[FileColumn.index]
-
-                    if row[FileColumn.pri_val] == -1:
-                        pri_low.append(index)
-                    elif row[FileColumn.pri_val] == 0:
-                        pri_norm.append(index)
-                    elif row[FileColumn.pri_val] == 1:
-                        pri_high.append(index)
-
-                    if row[FileColumn.download]:
-                        files_wanted.append(index)
-                    else:
-                        files_unwanted.append(index)
-
+                    add_file(_iter)
                 _iter = store.iter_next(_iter)
 
-        iterate_model(store.get_iter_first())
+        if store.iter_has_child(root_iter):
+            iterate_model(store.iter_children(root_iter))
+        else:
+            add_file(root_iter)
+
         args = {}  # TODO: Empty list is shorthand for all
         if files_wanted:
             args['files-wanted'] = files_wanted
@@ -113,10 +129,15 @@ class TorrentProperties(Gtk.Dialog):
 
     def do_response(self, response):
         if response == Gtk.ResponseType.APPLY:
-            args = self._get_wanted()
-            if args:
-                print(args)
-                self.client.torrent_set(self.torrent, args)
+            # Torrents with the same changes are sent together
+            batches = {}
+            for root_iter, torrent_id in self._roots:
+                args = self._get_wanted(root_iter)
+                if args:
+                    key = json.dumps(args, sort_keys=True)
+                    batches.setdefault(key, (args, []))[1].append(torrent_id)
+            for args, torrent_ids in batches.values():
+                self.client.torrent_set(torrent_ids, args)
 
         if response != Gtk.ResponseType.DELETE_EVENT:
             self.destroy()
@@ -9,3 +9,8 @@ def is_flatpak():
     if _is_flatpak is None:
         _is_flatpak = path.exists('/.flatpak-info')
     return _is_flatpak
+
+
+def normalize_directory(directory: str) -> str:
+    """Removes trailing slashes so the same directory always compares equal"""
+    return directory.rstrip('/')
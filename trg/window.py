@@ -18,8 +18,6 @@
 import logging
 from collections import namedtuple
 from contextlib import suppress
-from functools import lru_cache
-from urllib.parse import urlparse
 
 from gi.repository import (
     GLib,
@@ -29,10 +27,9 @@ from gi.repository import (
     Gtk,
 )
 
-from .list_model_override import ListStore
 from .gi_composites import GtkTemplate
-from .torrent_list_view import TorrentListView, TorrentColumn
-from .add_dialog import AddDialog, AddURIDialog
+from .torrent_filter import TorrentFilter
+from .torrent_list_view import TorrentListView
 from .client import Client
 
 
@@ -57,17 +54,14 @@ class ApplicationWindow(Gtk.ApplicationWindow):
         super().__init__(**kwargs)
         self.init_template()
         self._init_actions()
-        self._filter_status = None
-        self._filter_error = None
-        self._filter_text = None
-        self._filter_tracker = None
-        self._filter_directory = None
+        self._filter = TorrentFilter(self.client.props.torrents)
         self._add_dialogs = []
         self._queued_torrents = []
 
         self._hooks = [
             self.client.connect('notify::download-speed', self._on_speed_refresh),
             self.client.connect('notify::connected', self._on_connected_change),
+            self.client.connect('notify::stale', self._on_connected_change),
         ]
         self.client.bind_property('alt-speed-enabled', self.alt_speed_toggle,
                                   'active', GObject.BindingFlags.SYNC_CREATE)
@@ -82,6 +76,7 @@ class ApplicationWindow(Gtk.ApplicationWindow):
         view = TorrentListView(self.client.props.torrents, client=self.client, visible=True)
         self._filter_model = view.filter_model
         self._filter_model.set_visible_func(self._filter_model_func)
+        self._filter.set_model(self._filter_model.props.child_model)
         self.main_sw.add(view)
 
         self._filter_model.connect('row-deleted', self._on_row_deleted)
@@ -92,6 +87,7 @@ class ApplicationWindow(Gtk.ApplicationWindow):
         for hook in self._hooks:
             self.client.disconnect(hook)
         self._hooks = []
+        self._filter.destroy()
         Gtk.ApplicationWindow.do_destroy(self)
 
     def _init_actions(self):
@@ -123,6 +119,9 @@ class ApplicationWindow(Gtk.ApplicationWindow):
             self.main_stack.props.visible_child = self.main_box
             while self._queued_torrents:
                 self._on_torrent_add_real(*self._queued_torrents.pop(0))
+        elif self.client.props.stale:
+            # Show the last known list while the real one loads
+            self.main_stack.props.visible_child = self.main_box
         else:
             self.main_stack.props.visible_child = self.warning_page
 
@@ -163,15 +162,6 @@ class ApplicationWindow(Gtk.ApplicationWindow):
 
         Gtk.drag_finish(context, success, success, time)
 
-    @staticmethod
-    @lru_cache(maxsize=1000)
-    def _get_torrent_trackers(torrent) -> set:
-        trackers = set()
-        for tracker in ListStore(torrent.props.trackers):
-            tracker_url = urlparse(tracker.props.announce).hostname
-            trackers.add(tracker_url)
-        return trackers
-
     @GtkTemplate.Callback
     def _on_filter_button_toggled(self, button):
         if not button.props.active:
@@ -180,74 +170,65 @@ class ApplicationWindow(Gtk.ApplicationWindow):
             self.directory_box.foreach(lambda child: child.destroy())
             return
 
-        torrents = ListStore(self.client.props.torrents)
-
-        trackers = set()
-        for torrent in torrents:
-            trackers |= self._get_torrent_trackers(torrent)
-        for tracker in [_('Any')] + list(trackers):
-            button = Gtk.ModelButton(text=tracker,
-                                     action_name='win.filter_tracker',
-                                     action_target=GLib.Variant('s', tracker),
-                                     visible=True)
-            self.tracker_box.add(button)
+        facets = self.client.torrent_facets
+        self._add_filter_button(self.tracker_box, 'win.filter_tracker', _('Any'), _('Any'))
+        for tracker, count in facets.trackers.items():
+            self._add_filter_button(self.tracker_box, 'win.filter_tracker', tracker, tracker, count)
 
         # TODO: Might be a better way to show these
-        directories = {torrent.props.download_dir.rstrip('/') for torrent in torrents}
-        for directory in [_('Any')] + sorted(directories):
+        self._add_filter_button(self.directory_box, 'win.filter_directory', _('Any'), _('Any'))
+        for directory, count in facets.directories.items():
             label = directory.rpartition('/')[2]
             if len(label) >= 25:
                 label = '…' + label[-24:]
-            button = Gtk.ModelButton(text=label,
-                                     action_name='win.filter_directory',
-                                     action_target=GLib.Variant('s', directory),
-                                     visible=True)
-            self.directory_box.add(button)
+            self._add_filter_button(self.directory_box, 'win.filter_directory', directory, label, count)
+
+    @staticmethod
+    def _add_filter_button(box, action_name: str, target: str, label: str, count: int=None):
+        if count is not None:
+            label = '{} ({})'.format(label, count)
+        button = Gtk.ModelButton(text=label,
+                                 action_name=action_name,
+                                 action_target=GLib.Variant('s', target),
+                                 visible=True)
+        box.add(button)
 
     @GtkTemplate.Callback
     def _on_search_changed(self, entry):
-        text = entry.get_text().lower() or None
-        last_value = self._filter_text
-        self._filter_text = text
-        if last_value != text:
-            self._filter_model.refilter()
+        text = entry.get_text() or None
+        if self._filter.set_criteria(text=text):
+            self._refilter()
 
     def _on_status_filter(self, action, value):
         new_value = value.get_int32()
         action.set_state(value)
 
         if new_value < 0:
-            self._filter_status = None
-            self._filter_error = None
+            changed = self._filter.set_criteria(status=None, error=None)
         elif new_value >= 10:
             # Hack where we shove errors and status into same value
-            self._filter_error = new_value - 10
-            self._filter_status = None
+            changed = self._filter.set_criteria(status=None, error=new_value - 10)
         else:
-            self._filter_status = new_value
-            self._filter_error = None
+            changed = self._filter.set_criteria(status=new_value, error=None)
 
-        self._filter_model.refilter()
+        if changed:
+            self._refilter()
 
     def _on_tracker_filter(self, action, value):
         new_value = value.get_string()
 
         action.set_state(value)
-        if new_value == _('Any'):
-            self._filter_tracker = None
-        else:
-            self._filter_tracker = new_value
-        self._filter_model.refilter()
+        tracker = None if new_value == _('Any') else new_value
+        if self._filter.set_criteria(tracker=tracker):
+            self._refilter()
 
     def _on_directory_filter(self, action, value):
         new_value = value.get_string()
 
         action.set_state(value)
-        if new_value == _('Any'):
-            self._filter_directory = None
-        else:
-            self._filter_directory = new_value
-        self._filter_model.refilter()
+        directory = None if new_value == _('Any') else new_value
+        if self._filter.set_criteria(directory=directory):
+            self._refilter()
 
     @GtkTemplate.Callback
     def _on_search_toggle(self, button):
@@ -258,19 +239,11 @@ class ApplicationWindow(Gtk.ApplicationWindow):
         else:
             self.search_entry.grab_focus()
 
+    def _refilter(self):
+        self._filter.refilter()
+
     def _filter_model_func(self, model, it, data=None) -> bool:
-        if self._filter_status is not None and model[it][TorrentColumn.status] != self._filter_status:
-            return False
-        if self._filter_error is not None and model[it][TorrentColumn.error] != self._filter_error:
-            return False
-        if self._filter_text is not None and self._filter_text not in model[it][TorrentColumn.name].lower():
-            return False
-        if self._filter_directory is not None:
-            if self._filter_directory != model[it][TorrentColumn.directory].rstrip('/'):
-                return False
-        if self._filter_tracker is not None:
-            return self._filter_tracker in self._get_torrent_trackers(model[it][-1])
-        return True
+        return self._filter.matches(model.get_item(it))
 
     def _on_torrent_add_real(self, uri, uri_only):
         for dialog in self._add_dialogs:
@@ -279,6 +252,7 @@ class ApplicationWindow(Gtk.ApplicationWindow):
                 logging.info('Raising existing dialog for {}'.format(uri))
                 return
 
+        from .add_dialog import AddDialog, AddURIDialog
         if uri_only is True:
             dialog = AddURIDialog(transient_for=self,
                                   uri=uri,